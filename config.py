@@ -36,21 +36,90 @@ class Config:
     DB_PORT = load_env("DB_PORT")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
     DB_NAME = os.getenv("DB_NAME")
+    # comma separated "host" or "host:port" of read replicas of DB_HOST
+    DB_REPLICA_HOSTS = [
+        host.strip()
+        for host in os.getenv("DB_REPLICA_HOSTS", "").split(",")
+        if host.strip()
+    ]
+    # comma separated "host[:port][/dbname]" of the databases the carts are
+    # sharded across, carts stay in DB_HOST if empty
+    CART_SHARDS = [
+        shard.strip()
+        for shard in os.getenv("CART_SHARDS", "").split(",")
+        if shard.strip()
+    ]
 
     REDIS_HOST = os.getenv("REDIS_HOST")
     REDIS_PORT = os.getenv("REDIS_PORT")
 
+    MONGO_HOST = os.getenv("MONGO_HOST") or "store-mongodb"
+    MONGO_PORT = load_env("MONGO_PORT") or 27017
+
     ACCESS_EXPIRES = timedelta(days=load_env("ACCESS_EXPIRES") or 1)
     REFRESH_EXPIRES = timedelta(days=load_env("REFRESH_EXPIRES") or 10)
 
+    # password hashing, BCRYPT_LOG_ROUNDS is the bcrypt cost factor
+    BCRYPT_LOG_ROUNDS = load_env("BCRYPT_LOG_ROUNDS") or 12
+    BCRYPT_MAX_WORKERS = load_env("BCRYPT_MAX_WORKERS") or 2
+    BCRYPT_MAX_PENDING = load_env("BCRYPT_MAX_PENDING") or 16
+    BCRYPT_QUEUE_TIMEOUT = load_env("BCRYPT_QUEUE_TIMEOUT") or 5
+
     # limites
     CLIENT_RATE_LIMIT = load_env("CLIENT_RATE_LIMIT")
 
     # general settings
     LOGIN_DB_CONN = load_env("LOGIN_DB_CONN")
     CLIENT_CACHE_DB = load_env("CLIENT_CACHE_DB")
+    CATALOGUE_CACHE_DB = load_env("CATALOGUE_CACHE_DB") or 3
+    CATALOGUE_CACHE_TTL = load_env("CATALOGUE_CACHE_TTL") or 86400
+    QUERY_CACHE_DB = load_env("QUERY_CACHE_DB") or 4
+    QUERY_CACHE_TTL = load_env("QUERY_CACHE_TTL") or 300
+    QUERY_CACHE_LOCK_TIMEOUT = load_env("QUERY_CACHE_LOCK_TIMEOUT") or 5
+    CART_WRITE_BEHIND = load_env("CART_WRITE_BEHIND") or False
+    CART_BUFFER_DB = load_env("CART_BUFFER_DB") or 5
+    CART_BUFFER_TTL = load_env("CART_BUFFER_TTL") or 86400
+    CART_FLUSH_INTERVAL = load_env("CART_FLUSH_INTERVAL") or 1
+    CART_FLUSH_BATCH_SIZE = load_env("CART_FLUSH_BATCH_SIZE") or 500
+    CART_FLUSH_CLAIM_TIMEOUT = load_env("CART_FLUSH_CLAIM_TIMEOUT") or 60
+    PRODUCT_CACHE_SIZE = load_env("PRODUCT_CACHE_SIZE") or 10000
+    PRODUCT_CACHE_TTL = load_env("PRODUCT_CACHE_TTL") or 60
+    JTI_CACHE_SIZE = load_env("JTI_CACHE_SIZE") or 10000
+    JTI_CACHE_TTL = load_env("JTI_CACHE_TTL") or 5
+    USER_CACHE_TTL = load_env("USER_CACHE_TTL") or 3600
+    USER_LOCAL_CACHE_SIZE = load_env("USER_LOCAL_CACHE_SIZE") or 10000
+    USER_LOCAL_CACHE_TTL = load_env("USER_LOCAL_CACHE_TTL") or 30
     DB_POOL_MIN_CONN = load_env("DB_POOL_MIN_CONN") or 1
     DB_POOL_MAX_CONN = load_env("DB_POOL_MAX_CONN") or 2
+    DB_POOL_TIMEOUT = load_env("DB_POOL_TIMEOUT") or 10
+    DB_POOL_MAX_WAITING = load_env("DB_POOL_MAX_WAITING") or 0
+    DB_POOL_MAX_IDLE = load_env("DB_POOL_MAX_IDLE") or 600
+    DB_POOL_HARD_MAX_CONN = load_env("DB_POOL_HARD_MAX_CONN") or 10
+    DB_POOL_SCALE_INTERVAL = load_env("DB_POOL_SCALE_INTERVAL") or 1
+    DB_POOL_GROW_WAIT_MS = load_env("DB_POOL_GROW_WAIT_MS") or 50
+    DB_POOL_GROW_QUEUE = load_env("DB_POOL_GROW_QUEUE") or 1
+    DB_POOL_SCALE_STEP = load_env("DB_POOL_SCALE_STEP") or 2
+    SLOW_QUERY_MS = load_env("SLOW_QUERY_MS") or 200
+    DB_REPLICA_MAX_LAG = load_env("DB_REPLICA_MAX_LAG") or 5
+    DB_REPLICA_CHECK_INTERVAL = load_env("DB_REPLICA_CHECK_INTERVAL") or 5
+    DB_REPLICA_TIMEOUT = load_env("DB_REPLICA_TIMEOUT") or 1
+
+    # catalogue settings
+    CATALOGUE_PAGE_SIZE = load_env("CATALOGUE_PAGE_SIZE") or 50
+    CATALOGUE_MAX_PAGE_SIZE = load_env("CATALOGUE_MAX_PAGE_SIZE") or 500
+    CATALOGUE_STREAM_BATCH_SIZE = load_env("CATALOGUE_STREAM_BATCH_SIZE") or 500
+    BULK_CHUNK_SIZE = load_env("BULK_CHUNK_SIZE") or 1000
+
+    # mongo client settings
+    MONGO_MAX_POOL_SIZE = load_env("MONGO_MAX_POOL_SIZE") or 100
+    MONGO_MIN_POOL_SIZE = load_env("MONGO_MIN_POOL_SIZE") or 0
+    MONGO_MAX_IDLE_TIME_MS = load_env("MONGO_MAX_IDLE_TIME_MS")
+    MONGO_CONNECT_TIMEOUT_MS = load_env("MONGO_CONNECT_TIMEOUT_MS") or 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = (
+        load_env("MONGO_SERVER_SELECTION_TIMEOUT_MS") or 5000
+    )
+    MONGO_SOCKET_TIMEOUT_MS = load_env("MONGO_SOCKET_TIMEOUT_MS")
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = load_env("MONGO_WAIT_QUEUE_TIMEOUT_MS")
 
 
 class DevConfig(Config):
@@ -12,6 +12,6 @@ CREATE TABLE client (
 
 CREATE TABLE cart (
     id SERIAL PRIMARY KEY,
-	client_id INTEGER NOT NULL REFERENCES client(id),
+	client_id INTEGER NOT NULL UNIQUE REFERENCES client(id),
 	items JSONB
 );
\ No newline at end of file
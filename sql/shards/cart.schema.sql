@@ -0,0 +1,13 @@
+--
+-- Store Postgresql Schema of a cart shard database
+--
+-- Carts are spread across the CART_SHARDS databases by client_id, the clients
+-- stay in the main database so there is no foreign key to client here.
+--
+
+
+CREATE TABLE cart (
+    id SERIAL PRIMARY KEY,
+	client_id INTEGER NOT NULL UNIQUE,
+	items JSONB
+);
@@ -5,15 +5,30 @@ from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from pymongo import MongoClient
 from psycopg.conninfo import make_conninfo
 from psycopg_pool import ConnectionPool
 from psycopg.rows import dict_row
+from prometheus_client import CollectorRegistry
 from dotenv import load_dotenv
 from werkzeug.utils import import_string
 
 from .database.database_config_pool import DatabasePool
+from .database.mongo_indexes import create_product_indexes
+from .database.pool_autoscaler import PoolAutoscaler
+from .database.replica_router import ReplicaRouter
+from .database.shard_router import ShardRouter, parse_shard
 
 from .utils.redis_queue import RedisQueue
+from .utils.catalogue_cache import CatalogueCache
+from .utils.query_cache import QueryCache
+from .utils.cart_buffer import CartBuffer
+from .utils.product_cache import ProductCache
+from .utils.password_hasher import PasswordHasher
+from .utils.token_store import TokenStore
+from .utils.user_cache import UserCache
+from .utils.query_registry import QueryRegistry
+from .utils.metrics import StatsCollector, instrumented_cursor
 
 jwt = JWTManager()
 
@@ -101,15 +116,84 @@ def register_middleware(app: Flask) -> None:
 
 def update_app_config(app: Flask) -> None:
     """Helper function to add objects to app config."""
+    from src.auth_api.sql import AUTH_API_QUERIES
+    from src.catalogue_api.sql import CATALOGUE_API_QUERIES
 
     ### Create database poll ###
     ############################
 
-    with app.app_context():
-        db_conn_pool = DatabasePool(
-            min_conn=app.config["DB_POOL_MIN_CONN"],
-            max_conn=app.config["DB_POOL_MAX_CONN"],
-        )
+    # one pool of connections shared by db_connection and DatabasePool
+    db_pool = initialize_db_pool(app)
+    db_conn_pool = DatabasePool(db_pool)
+
+    # grow and shrink the pool with the load
+    db_pool_autoscaler = PoolAutoscaler(
+        db_pool,
+        hard_max=app.config["DB_POOL_HARD_MAX_CONN"],
+        interval=app.config["DB_POOL_SCALE_INTERVAL"],
+        grow_wait_ms=app.config["DB_POOL_GROW_WAIT_MS"],
+        grow_queue=app.config["DB_POOL_GROW_QUEUE"],
+        step=app.config["DB_POOL_SCALE_STEP"],
+        logger=app.logger,
+    ).start()
+
+    # optional read replicas for the read-only queries
+    replica_router = None
+    if replica_hosts := app.config["DB_REPLICA_HOSTS"]:
+        replica_pools = []
+        for replica in replica_hosts:
+            host, _, port = replica.partition(":")
+            replica_pools.append(
+                initialize_db_pool(
+                    app, host=host, port=int(port or 5432), name=f"replica-{replica}"
+                )
+            )
+        replica_router = ReplicaRouter(
+            replica_pools,
+            max_lag=app.config["DB_REPLICA_MAX_LAG"],
+            check_interval=app.config["DB_REPLICA_CHECK_INTERVAL"],
+            checkout_timeout=app.config["DB_REPLICA_TIMEOUT"],
+            logger=app.logger,
+        ).start()
+
+    # carts are sharded across CART_SHARDS, or all in the main database
+    cart_shards = ShardRouter([db_pool])
+    if shards := app.config["CART_SHARDS"]:
+        shard_pools = []
+        for shard in shards:
+            host, port, dbname = parse_shard(shard, app.config["DB_NAME"])
+            shard_pools.append(
+                initialize_db_pool(
+                    app, host=host, port=port, dbname=dbname, name=f"cart-{shard}"
+                )
+            )
+        cart_shards = ShardRouter(shard_pools)
+
+    # every .sql file of the APIs, loaded once, the app doesn't start
+    # if any of the queries used by the routes is missing
+    query_registry = QueryRegistry(
+        AUTH_API_QUERIES,
+        CATALOGUE_API_QUERIES,
+        required=[
+            "create_user",
+            "login_user",
+            "update_password",
+            "get_client",
+            "add_cart_item",
+            "get_cart",
+            "set_cart_items",
+        ],
+    )
+
+    ### Create mongo client ###
+    ###########################
+
+    # the indexes are created with a client of their own, closed right
+    # after, so the shared client only connects on its first request
+    with initialize_mongo_client(app) as index_client:
+        create_product_indexes(index_client.store.products)
+
+    mongo_client = initialize_mongo_client(app)
 
     ### Create redis connections ###
     ################################
@@ -128,6 +212,78 @@ def update_app_config(app: Flask) -> None:
         decode_responses=True,
     )
 
+    catalogue_cache = CatalogueCache(
+        host=app.config["REDIS_HOST"],
+        port=app.config["REDIS_PORT"],
+        cache_db=app.config["CATALOGUE_CACHE_DB"],
+        ttl=app.config["CATALOGUE_CACHE_TTL"],
+    )
+
+    query_cache = QueryCache(
+        host=app.config["REDIS_HOST"],
+        port=app.config["REDIS_PORT"],
+        cache_db=app.config["QUERY_CACHE_DB"],
+        ttl=app.config["QUERY_CACHE_TTL"],
+        lock_timeout=app.config["QUERY_CACHE_LOCK_TIMEOUT"],
+    )
+
+    ### Create local caches ###
+    ###########################
+
+    product_cache = ProductCache(
+        mongo_client.store.products,
+        max_size=app.config["PRODUCT_CACHE_SIZE"],
+        ttl=app.config["PRODUCT_CACHE_TTL"],
+    )
+    catalogue_cache.subscribe(product_cache.clear)
+
+    token_store = TokenStore(
+        redis_login_connection,
+        cache_size=app.config["JTI_CACHE_SIZE"],
+        cache_ttl=app.config["JTI_CACHE_TTL"],
+    )
+
+    user_cache = UserCache(
+        redis_users_cache_conn,
+        db_pool,
+        query=query_registry["get_client"],
+        ttl=app.config["USER_CACHE_TTL"],
+        local_size=app.config["USER_LOCAL_CACHE_SIZE"],
+        local_ttl=app.config["USER_LOCAL_CACHE_TTL"],
+    )
+
+    ### Create cart write-behind buffer ###
+    #######################################
+
+    cart_buffer = None
+    if app.config["CART_WRITE_BEHIND"]:
+        cart_buffer = CartBuffer(
+            redis.Redis(
+                host=app.config["REDIS_HOST"],
+                port=app.config["REDIS_PORT"],
+                db=app.config["CART_BUFFER_DB"],
+                decode_responses=True,
+            ),
+            cart_shards,
+            query_registry,
+            query_cache=query_cache,
+            flush_interval=app.config["CART_FLUSH_INTERVAL"],
+            batch_size=app.config["CART_FLUSH_BATCH_SIZE"],
+            claim_timeout=app.config["CART_FLUSH_CLAIM_TIMEOUT"],
+            ttl=app.config["CART_BUFFER_TTL"],
+            logger=app.logger,
+        ).start()
+
+    ### Create password hasher ###
+    ##############################
+
+    password_hasher = PasswordHasher(
+        rounds=app.config["BCRYPT_LOG_ROUNDS"],
+        max_workers=app.config["BCRYPT_MAX_WORKERS"],
+        max_pending=app.config["BCRYPT_MAX_PENDING"],
+        queue_timeout=app.config["BCRYPT_QUEUE_TIMEOUT"],
+    )
+
     ### Create redis queues ###
     ###########################
 
@@ -138,6 +294,32 @@ def update_app_config(app: Flask) -> None:
         queue_db=13,
     )
 
+    ### Create metrics registry ###
+    ###############################
+
+    # pools, caches and hasher stats exported next to the query metrics
+    metrics_registry = CollectorRegistry()
+    metrics_registry.register(
+        StatsCollector(
+            db_pools=[
+                db_pool,
+                *(replica_router.pools if replica_router else []),
+                *(cart_shards.pools if shards else []),
+            ],
+            stats={
+                "db_pool_autoscaler": db_pool_autoscaler.stats,
+                "catalogue_cache": catalogue_cache.stats,
+                "query_cache": query_cache.stats,
+                **({"cart_buffer": cart_buffer.stats} if cart_buffer else {}),
+                "product_cache": product_cache.stats,
+                "token_cache": token_store.stats,
+                "user_cache": user_cache.stats,
+                "password_hasher": password_hasher.stats,
+            },
+            logger=app.logger,
+        )
+    )
+
     # db_insertion_queue = None
     # if "main_api" in app.config.get("APIS_IN_USE", []):
     #     db_insertion_queue = RedisQueue(
@@ -155,19 +337,39 @@ def update_app_config(app: Flask) -> None:
 
     app.config.update(
         {
-            "db_pool": initialize_db_pool(app),
+            "db_pool": db_pool,
             "db_conn_pool": db_conn_pool,
+            "query_registry": query_registry,
+            "db_pool_autoscaler": db_pool_autoscaler,
+            "replica_router": replica_router,
+            "cart_shards": cart_shards,
+            "mongo_client": mongo_client,
             "redis_login_connection": redis_login_connection,
             "redis_users_cache_conn": redis_users_cache_conn,
+            "catalogue_cache": catalogue_cache,
+            "query_cache": query_cache,
+            "cart_buffer": cart_buffer,
+            "product_cache": product_cache,
+            "token_store": token_store,
+            "user_cache": user_cache,
+            "password_hasher": password_hasher,
             "error_notification_queue": error_notification_queue,
+            "metrics_registry": metrics_registry,
             # "db_insertion_queue": db_insertion_queue,
         }
     )
 
 
-def initialize_db_pool(app: Flask) -> ConnectionPool:
+def initialize_db_pool(
+    app: Flask,
+    host: str | None = None,
+    port: int = 5432,
+    dbname: str | None = None,
+    name: str = "primary",
+) -> ConnectionPool:
     """
-    Create an instance of a threaded psycopg3 pool.
+    Create an instance of a threaded psycopg3 pool,
+    to DB_HOST and DB_NAME unless another host or database is given.
     https://www.psycopg.org/psycopg3/docs/api/pool.html#psycopg_pool.ConnectionPool
     """
 
@@ -176,15 +378,50 @@ def initialize_db_pool(app: Flask) -> ConnectionPool:
     conninfo = make_conninfo(
         user=app.config["DB_USER"],
         password=app.config["DB_PASSWORD"],
-        host=app.config["DB_HOST"],
-        port=5432,
-        dbname=app.config["DB_NAME"],
+        host=host or app.config["DB_HOST"],
+        port=port,
+        dbname=dbname or app.config["DB_NAME"],
     )
 
-    # return psycopg3 database pool instance
+    # return psycopg3 database pool instance,
+    # requests waiting for a connection are served in FIFO order
     return ConnectionPool(
         conninfo=conninfo,
+        name=name,
         min_size=app.config.get("DB_POOL_MIN_CONN", 1),
         max_size=app.config.get("DB_POOL_MAX_CONN", 2),
-        kwargs={"row_factory": dict_row},
+        timeout=app.config.get("DB_POOL_TIMEOUT", 10),
+        max_waiting=app.config.get("DB_POOL_MAX_WAITING", 0),
+        max_idle=app.config.get("DB_POOL_MAX_IDLE", 600),
+        kwargs={
+            "row_factory": dict_row,
+            "cursor_factory": instrumented_cursor(
+                app.config["SLOW_QUERY_MS"], app.logger
+            ),
+        },
+    )
+
+
+def initialize_mongo_client(app: Flask) -> MongoClient:
+    """
+    Create the app-wide MongoDB client. MongoClient is thread-safe and holds
+    its own connection pool, so one instance is shared by all requests.
+    https://pymongo.readthedocs.io/en/stable/faq.html#how-does-connection-pooling-work-in-pymongo
+
+    `connect=False` defers the first connection (and the monitor threads)
+    until the first operation, so the client is safe to create before
+    the server forks its workers.
+    """
+
+    return MongoClient(
+        host=app.config["MONGO_HOST"],
+        port=app.config["MONGO_PORT"],
+        maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"],
+        minPoolSize=app.config["MONGO_MIN_POOL_SIZE"],
+        maxIdleTimeMS=app.config["MONGO_MAX_IDLE_TIME_MS"],
+        connectTimeoutMS=app.config["MONGO_CONNECT_TIMEOUT_MS"],
+        serverSelectionTimeoutMS=app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        socketTimeoutMS=app.config["MONGO_SOCKET_TIMEOUT_MS"],
+        waitQueueTimeoutMS=app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+        connect=False,
     )
@@ -1,33 +1,27 @@
 from .. import auth_blueprint as bp
 from flask import current_app, request, abort, jsonify
-from flask_bcrypt import Bcrypt
-from src.utils.extras import validate_data, db_connection, read_query
+from src.utils.extras import validate_data, db_connection
 from pydantic import BaseModel, Extra, StrictStr, validator, root_validator
 import re
-from ..sql import AUTH_API_QUERIES
 from psycopg.errors import UniqueViolation
 
 
-bcrypt = Bcrypt()
-
-
 @bp.route("/create", methods=["PUT"])
 def create_user():
     if not (body := request.get_json(silent=True)):
         abort(400, "Missing JSON in Request")
 
     pydantic_data = validate_data(body, ValidateRegisterInput)
-    pydantic_data["password"] = bcrypt.generate_password_hash(
-        pydantic_data["password"]
-    ).decode("utf-8")
+    password_hasher = current_app.config["password_hasher"]
+    pydantic_data["password"] = password_hasher.hash(pydantic_data["password"])
     pydantic_data.pop("confirm_password")
 
-    query = read_query(AUTH_API_QUERIES / "create_user.sql")
+    query_registry = current_app.config["query_registry"]
 
     db_pool = current_app.config["db_pool"]
     try:
         with db_connection(db_pool) as conn:
-            with conn.execute(query, pydantic_data) as cursor:
+            with query_registry.execute(conn, "create_user", pydantic_data) as cursor:
                 result = cursor.fetchone()
     except UniqueViolation:
         abort(409, "Email already exists")
@@ -1,15 +1,11 @@
 from .. import auth_blueprint as bp
 import json
 from flask import abort, request, jsonify, current_app
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jti
 from pydantic import BaseModel, Extra, StrictStr, validator, root_validator
 from psycopg.errors import UniqueViolation
-from src.utils.extras import validate_data, db_connection, read_query
+from src.utils.extras import validate_data, db_connection, read_only_passes
 import re
-from ..sql import AUTH_API_QUERIES
-
-bcrypt = Bcrypt()
 
 
 @bp.route("/login", methods=["GET"])
@@ -18,35 +14,57 @@ def login_user():
         abort(404, "Missing JSON in request")
 
     pydantic_data = validate_data(body, ValidateLoginInput)
-    query = read_query(AUTH_API_QUERIES / "login_user.sql")
+    query_registry = current_app.config["query_registry"]
     db_pool = current_app.config["db_pool"]
+    password_hasher = current_app.config["password_hasher"]
+
+    # read from a replica, a client created in the last few seconds
+    # may not be there yet so a missing one is looked up on the primary
+    for read_only in read_only_passes():
+        with db_connection(db_pool, read_only=read_only) as conn:
+            with query_registry.execute(conn, "login_user", pydantic_data) as cursor:
+                result = cursor.fetchone()
+        if result:
+            break
 
-    with db_connection(db_pool) as conn:
-        with conn.execute(query, pydantic_data) as cursor:
-            result = cursor.fetchone()
-            if not result:
-                abort(404, "User does not exist")
-            if not bcrypt.check_password_hash(
-                result["password"], pydantic_data["password"]
-            ):
-                abort(401, "Wrong login info")
-            # """
-            # Get access and refresh tokens
-            # """
-            access_token = create_access_token(identity=result["email"])
-            refresh_token = create_refresh_token(identity=result["email"])
-            """
-            get_jti encoded tokens
-            """
-            access_jti = get_jti(encoded_token=access_token)
-            refresh_jti = get_jti(encoded_token=refresh_token)
+    if not result:
+        abort(404, "User does not exist")
+    if not password_hasher.check(result["password"], pydantic_data["password"]):
+        abort(401, "Wrong login info")
 
-            # redis connection
-            redis_login_connection = current_app.config["redis_login_connection"]
+    # rehash the password if the bcrypt cost has been changed since
+    if password_hasher.needs_rehash(result["password"]):
+        data = {
+            "email": result["email"],
+            "password": password_hasher.hash(pydantic_data["password"]),
+        }
+        with db_connection(db_pool) as conn:
+            query_registry.execute(conn, "update_password", data)
+    # """
+    # Get access and refresh tokens
+    # """
+    access_token = create_access_token(identity=result["email"])
+    refresh_token = create_refresh_token(identity=result["email"])
+    """
+    get_jti encoded tokens
+    """
+    access_jti = get_jti(encoded_token=access_token)
+    refresh_jti = get_jti(encoded_token=refresh_token)
 
-            print(access_token, refresh_token)
+    # store the tokens as valid sessions of the user
+    current_app.config["token_store"].add_session(
+        result["email"],
+        access_jti,
+        refresh_jti,
+        access_expires=current_app.config["ACCESS_EXPIRES"],
+        refresh_expires=current_app.config["REFRESH_EXPIRES"],
+    )
 
-    response = {"message": "Login successful"}
+    response = {
+        "message": "Login successful",
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+    }
 
     return jsonify(response)
 
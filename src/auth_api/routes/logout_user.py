@@ -0,0 +1,25 @@
+from .. import auth_blueprint as bp
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+
+@bp.route("/logout/all", methods=["DELETE"])
+@jwt_required()
+def logout_user_everywhere():
+    """
+    Endpoint to revoke all the access and refresh tokens of the user
+    :method: DELETE
+    :input: Authorization header with an access token
+    :return: JSON response
+        {
+            "message": "Logged out from all sessions",
+            "revoked": "number of revoked tokens"
+        }
+    """
+
+    token_store = current_app.config["token_store"]
+    revoked = token_store.revoke_all(get_jwt_identity())
+
+    response = {"message": "Logged out from all sessions", "revoked": revoked}
+
+    return jsonify(response)
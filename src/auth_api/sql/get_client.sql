@@ -0,0 +1 @@
+SELECT id, email FROM client WHERE email = %(email)s
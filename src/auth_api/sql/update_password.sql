@@ -0,0 +1,3 @@
+UPDATE client
+SET password = %(password)s
+WHERE email = %(email)s
@@ -1,12 +1,12 @@
-import json
 from flask import abort, request, current_app
+from flask_jwt_extended import current_user, jwt_required
 from pydantic import BaseModel, Extra, StrictInt, StrictStr
-from src.utils.extras import read_query, validate_data, mongo_connection, db_connection
-from ..sql import CATALOGUE_API_QUERIES
+from src.utils.extras import validate_data, db_connection, invalidate_cart
 from .. import catalogue_blueprint as bp
 
 
 @bp.route("/add", methods=["PUT"])
+@jwt_required()
 def add_to_cart():
     """
     Endpoint to add a product to the cart
@@ -23,8 +23,7 @@ def add_to_cart():
         }
     """
 
-    # client_id = 2 hardcoded needs to be taken from the token when implemented
-    client_id = 2
+    client_id = current_user["id"]
 
     # check for JSON body
     if not (body := request.get_json(silent=True)):
@@ -32,64 +31,32 @@ def add_to_cart():
 
     validated_data = validate_data(body, AddToCartModel)
 
-    # check if the product exists in the mongo database
-    mongo_conn = mongo_connection()
-    db = mongo_conn["store"]
-    products = db["products"]
-    if not products.find_one({"_id": validated_data["id"]}):
+    # check if the product exists, usually without a round trip to mongo
+    product_cache = current_app.config["product_cache"]
+    if product_cache.get(validated_data["id"]) is None:
         abort(404, "Product not found")
 
-    data = {"client_id": client_id}
+    # in write-behind mode only change the cart in redis,
+    # it's written to postgres in the background
+    if cart_buffer := current_app.config["cart_buffer"]:
+        (quantity,) = cart_buffer.add(client_id, [validated_data])
+    else:
+        data = {"client_id": client_id, **validated_data}
 
-    query = read_query(CATALOGUE_API_QUERIES / "get_cart.sql")
+        query_registry = current_app.config["query_registry"]
 
-    # check if the user has already a cart in postgres database
-    db_pool = current_app.config["db_pool"]
-    with db_connection(db_pool) as conn:
-        with conn.execute(query, data) as cursor:
-            result = cursor.fetchall()
+        # create the cart or add the product to it in a single atomic statement,
+        # in the database of the client's cart shard
+        db_pool = current_app.config["cart_shards"].pool_for(client_id)
+        with db_connection(db_pool) as conn:
+            with query_registry.execute(conn, "add_cart_item", data) as cursor:
+                quantity = cursor.fetchone()["quantity"]
 
-        # if the user has a cart, update it
-        if result:
-            items = result[0]["items"]
+        # drop the cached cart
+        invalidate_cart(client_id)
 
-            # check if the product already exists in the cart if yess add plus the quantity to the existing one
-            # else add the product to the cart
-
-            if any(item["id"] == validated_data["id"] for item in items):
-                for item in items:
-                    if item["id"] == validated_data["id"]:
-                        item["quantity"] += validated_data["quantity"]
-                        data["items"] = json.dumps(items)
-
-                        query = read_query(CATALOGUE_API_QUERIES / "update_cart.sql")
-
-                        with conn.execute(query, data) as cursor:
-                            cursor.fetchall()
-                        return {
-                            "status": "success",
-                            "message": "Product updated successfully",
-                        }
-            else:
-                query = read_query(CATALOGUE_API_QUERIES / "update_cart.sql")
-                items.append(validated_data)
-                data["items"] = json.dumps(items)
-
-                with conn.execute(query, data) as cursor:
-                    cursor.fetchall()
-
-                return {"status": "success", "message": "Product added successfully"}
-
-        # else create a new cart
-        else:
-            items = []
-            items.append(validated_data)
-            data["items"] = json.dumps(items)
-
-            query = read_query(CATALOGUE_API_QUERIES / "create_cart.sql")
-
-            with conn.execute(query, data) as cursor:
-                cursor.fetchall()
+    if quantity != validated_data["quantity"]:
+        return {"status": "success", "message": "Product updated successfully"}
     return {"status": "success", "message": "Product added successfully"}
 
 
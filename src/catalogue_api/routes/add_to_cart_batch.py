@@ -0,0 +1,93 @@
+from flask import abort, request, current_app
+from flask_jwt_extended import current_user, jwt_required
+from pydantic import BaseModel, Extra, conlist
+from src.utils.extras import validate_data, run_pipeline, invalidate_cart
+from .. import catalogue_blueprint as bp
+from .add_to_cart import AddToCartModel
+
+
+@bp.route("/add/batch", methods=["PUT"])
+@jwt_required()
+def add_to_cart_batch():
+    """
+    Endpoint to add multiple products to the cart at once
+    :method: PUT
+    :input: JSON payload
+        {
+            "items": [
+                {
+                    "id": "product id",
+                    "quantity": "product quantity"
+                }
+            ]
+        }
+    :return: JSON response, one result per item in the same order
+        {
+            "status": "success",
+            "items": [
+                {
+                    "id": "product id",
+                    "status": "success" | "failed",
+                    "message": "Product added successfully"
+                }
+            ]
+        }
+    """
+
+    client_id = current_user["id"]
+
+    # check for JSON body
+    if not (body := request.get_json(silent=True)):
+        abort(400, "Missing JSON Body in the Request")
+
+    items = validate_data(body, AddToCartBatchModel)["items"]
+
+    # check which products exist, the ones that aren't cached
+    # are fetched from the mongo database with a single query
+    product_cache = current_app.config["product_cache"]
+    products = product_cache.get_many(item["id"] for item in items)
+
+    results = [
+        {"id": item["id"], "status": "failed", "message": "Product not found"}
+        for item in items
+    ]
+    to_add = [i for i, item in enumerate(items) if products[item["id"]] is not None]
+
+    quantities = []
+    if to_add and (cart_buffer := current_app.config["cart_buffer"]):
+        # in write-behind mode only change the cart in redis,
+        # it's written to postgres in the background
+        quantities = cart_buffer.add(client_id, [items[i] for i in to_add])
+
+    elif to_add:
+        statements = [
+            ("add_cart_item", {"client_id": client_id, **items[i]}) for i in to_add
+        ]
+
+        # add all the products in one transaction and one round trip
+        rows = run_pipeline(
+            current_app.config["cart_shards"].pool_for(client_id),
+            current_app.config["query_registry"],
+            statements,
+        )
+        quantities = [row["quantity"] for (row,) in rows]
+
+        # drop the cached cart
+        invalidate_cart(client_id)
+
+    for i, quantity in zip(to_add, quantities):
+        message = (
+            "Product added successfully"
+            if quantity == items[i]["quantity"]
+            else "Product updated successfully"
+        )
+        results[i].update(status="success", message=message)
+
+    return {"status": "success", "items": results}
+
+
+class AddToCartBatchModel(BaseModel):
+    items: conlist(AddToCartModel, min_items=1, max_items=100)
+
+    class Config:
+        extra = Extra.forbid
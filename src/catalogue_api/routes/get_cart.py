@@ -0,0 +1,80 @@
+from flask import current_app
+from flask_jwt_extended import current_user, jwt_required
+from src.utils.extras import db_connection
+from src.utils.query_cache import cached_query
+from .. import catalogue_blueprint as bp
+
+
+@bp.route("/cart", methods=["GET"])
+@jwt_required()
+def get_cart():
+    """
+    Endpoint to get the cart with the current product details
+    :method: GET
+    :input: None
+    :return: JSON response
+        {
+            "cart": [
+                {
+                    "id": "product id",
+                    "quantity": "quantity in the cart",
+                    "name": "product name",
+                    "price": "product price",
+                    "stock": "product quantity in stock"
+                }
+            ],
+            "total": "sum of price * quantity of all the products"
+        }
+        Products that were removed from the catalogue have null name,
+        price and stock and are not counted in the total.
+    """
+
+    client_id = current_user["id"]
+
+    # in write-behind mode the cart in redis is the latest one
+    cart_buffer = current_app.config["cart_buffer"]
+    if not cart_buffer or (items := cart_buffer.get(client_id)) is None:
+        items = get_cart_items(client_id)
+
+    # get the details of all the products in the cart, the ones that aren't
+    # cached are fetched from the mongo database with a single query
+    product_cache = current_app.config["product_cache"]
+    details = product_cache.get_many(item["id"] for item in items)
+
+    cart = []
+    total = 0
+    for item in items:
+        product = details[item["id"]] or {}
+        cart.append(
+            {
+                "id": item["id"],
+                "quantity": item["quantity"],
+                "name": product.get("name"),
+                "price": product.get("price"),
+                "stock": product.get("quantity"),
+            }
+        )
+        if product.get("price") is not None:
+            total += product["price"] * item["quantity"]
+
+    return {"cart": cart, "total": total}
+
+
+@cached_query("get_cart", tags=lambda client_id: [f"cart:{client_id}"])
+def get_cart_items(client_id: int) -> list[dict]:
+    """
+    Return the items in the client's cart, cached until the cart changes.
+    Invalidate the "cart:{client_id}" tag on every write to the cart.
+    """
+
+    query_registry = current_app.config["query_registry"]
+
+    # the database of the client's cart shard
+    db_pool = current_app.config["cart_shards"].pool_for(client_id)
+    with db_connection(db_pool) as conn:
+        with query_registry.execute(
+            conn, "get_cart", {"client_id": client_id}
+        ) as cursor:
+            result = cursor.fetchone()
+
+    return result["items"] if result and result["items"] else []
@@ -1,13 +1,39 @@
-from src.utils.extras import mongo_connection
+import json
+import base64
+import binascii
+import redis
+from typing import Literal
+from urllib.parse import urlencode
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app, request, Response, stream_with_context
+from pydantic import BaseModel, Extra, StrictStr, conint, validator
+from src.utils.extras import validate_data
+from src.utils.models import AddProductModel
 from .. import catalogue_blueprint as bp
 
+PRODUCT_FIELDS = tuple(AddProductModel.__fields__)
+
+# fields the catalogue can be sorted by, and whether the field is unique.
+# Non unique fields are tie-broken by _id to keep the keyset pagination stable.
+SORT_FIELDS = {"_id": True, "name": True, "price": False}
+
 
 @bp.route("/get", methods=["GET"])
 def get_catalogue():
     """
     Endpoint to get the catalogue
     :method: GET
-    :input: None
+    :input: Query parameters (all optional)
+        category: only products from this category
+        min_price: only products with price greater than or equal
+        max_price: only products with price less than or equal
+        in_stock: if true, only products with quantity greater than 0
+        sort: one of "price", "-price", "name", "-name"
+        fields: comma separated product fields to return, e.g. "name,price"
+        limit: number of products per page
+        after: opaque token from the previous page's "next"
+        stream: if true, stream all the matching products instead of a page
 
     :return: JSON response
         {
@@ -20,18 +46,231 @@ def get_catalogue():
                     "description": "product description"
                     "image_url": "product image url"
                 }
-            ]
+            ],
+            "next": "token for the next page or null"
         }
     """
 
-    # connection to MongoDB
-    mongo_client = mongo_connection()
+    validated_data = validate_data(request.args.to_dict(), GetCatalogueModel)
+
+    # shared MongoDB client
+    mongo_client = current_app.config["mongo_client"]
     collection = mongo_client.store.products
 
-    # get all products from the database
-    products = collection.find({}, {"_id": 0})
+    if validated_data["stream"]:
+        return stream_catalogue(collection, validated_data)
+
+    limit = validated_data["limit"] or current_app.config["CATALOGUE_PAGE_SIZE"]
+    validated_data["limit"] = min(limit, current_app.config["CATALOGUE_MAX_PAGE_SIZE"])
+
+    # serve the page from the cache if the catalogue hasn't changed since
+    # it was cached, a cache outage falls back to MongoDB
+    catalogue_cache = current_app.config["catalogue_cache"]
+    variant = cache_variant(validated_data)
+    try:
+        version, entry = catalogue_cache.get(variant)
+    except redis.RedisError:
+        version, entry = None, None
+    if entry is not None:
+        return Response(entry, mimetype="application/json")
+
+    body = current_app.json.dumps(get_catalogue_page(collection, validated_data))
+
+    if version is not None:
+        try:
+            catalogue_cache.set(version, variant, body)
+        except redis.RedisError:
+            pass
+
+    return Response(body, mimetype="application/json")
+
+
+def get_catalogue_page(collection, params: dict) -> dict:
+    """
+    Keyset pagination: continue after the sort key of the last product of the
+    previous page. Together with the filters this is served by the product
+    indexes no matter how deep the page is.
+    """
+
+    limit = params["limit"]
+    sort_field, direction = parse_sort(params["sort"])
+    query = build_filter(params)
+
+    if params["after"]:
+        _, last_value, last_id = params["after"]
+        keyset = keyset_filter(sort_field, direction, last_value, last_id)
+        query = {"$and": [query, keyset]} if query else keyset
+
+    # fetch one extra product to know if there is a next page
+    cursor = collection.find(query, build_projection(params))
+    cursor = cursor.sort(sort_spec(sort_field, direction)).limit(limit + 1)
+    products = list(cursor)
+
+    next_token = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        last_value = None if sort_field == "_id" else last.get(sort_field)
+        next_token = encode_page_token(sort_field, last_value, last["_id"])
 
-    # return products
     return {
-        "catalogue": list(products),
+        "catalogue": [strip_product(product, params) for product in products],
+        "next": next_token,
     }
+
+
+def stream_catalogue(collection, params: dict) -> Response:
+    """
+    Stream all the matching products as the same JSON object the paginated
+    endpoint returns, writing products straight from the Mongo cursor so that
+    only one cursor batch is held in memory at a time.
+    """
+
+    batch_size = current_app.config["CATALOGUE_STREAM_BATCH_SIZE"]
+    sort_field, direction = parse_sort(params["sort"])
+    cursor = collection.find(build_filter(params), build_projection(params))
+    cursor = cursor.sort(sort_spec(sort_field, direction)).batch_size(batch_size)
+
+    def generate():
+        try:
+            yield '{"catalogue": ['
+            chunk = []
+            for i, product in enumerate(cursor):
+                product = strip_product(product, params)
+                chunk.append(("," if i else "") + current_app.json.dumps(product))
+                if len(chunk) >= batch_size:
+                    yield "".join(chunk)
+                    chunk = []
+            yield "".join(chunk)
+            yield '], "next": null}'
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def parse_sort(sort: str | None) -> tuple[str, int]:
+    if not sort:
+        return "_id", 1
+    return sort.lstrip("-"), -1 if sort.startswith("-") else 1
+
+
+def sort_spec(sort_field: str, direction: int) -> list[tuple[str, int]]:
+    spec = [(sort_field, direction)]
+    if not SORT_FIELDS[sort_field]:
+        spec.append(("_id", direction))
+    return spec
+
+
+def build_filter(params: dict) -> dict:
+    query = {}
+    if params["category"] is not None:
+        query["category"] = params["category"]
+    if params["min_price"] is not None:
+        query.setdefault("price", {})["$gte"] = params["min_price"]
+    if params["max_price"] is not None:
+        query.setdefault("price", {})["$lte"] = params["max_price"]
+    if params["in_stock"]:
+        query["quantity"] = {"$gt": 0}
+    return query
+
+
+def keyset_filter(sort_field: str, direction: int, last_value, last_id) -> dict:
+    op = "$gt" if direction == 1 else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    if SORT_FIELDS[sort_field]:
+        return {sort_field: {op: last_value}}
+    return {
+        "$or": [
+            {sort_field: {op: last_value}},
+            {sort_field: last_value, "_id": {op: last_id}},
+        ]
+    }
+
+
+def build_projection(params: dict) -> dict | None:
+    """
+    Project only the requested fields plus the ones needed for the next
+    page token. None means all the fields.
+    """
+    if not params["fields"]:
+        return None
+    sort_field, _ = parse_sort(params["sort"])
+    return dict.fromkeys({"_id", sort_field, *params["fields"]}, 1)
+
+
+def strip_product(product: dict, params: dict) -> dict:
+    """Remove the fields that are in the product only for pagination."""
+    product.pop("_id", None)
+    if params["fields"]:
+        for field in set(product) - set(params["fields"]):
+            product.pop(field)
+    return product
+
+
+def cache_variant(params: dict) -> str:
+    """Canonical cache key part for the requested page."""
+    # compare by identity, a min_price or max_price of 0 == False is a filter
+    variant = {
+        key: ",".join(value) if key == "fields" else value
+        for key, value in params.items()
+        if value is not None and value is not False and key not in ("after", "stream")
+    }
+    if params["after"]:
+        variant["after"] = encode_page_token(*params["after"])
+    return urlencode(sorted(variant.items()))
+
+
+def encode_page_token(sort_field: str, last_value, last_id: ObjectId) -> str:
+    token = json.dumps([sort_field, last_value, str(last_id)])
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(token: str) -> tuple[str, str | int | None, ObjectId]:
+    try:
+        sort_field, last_value, last_id = json.loads(base64.urlsafe_b64decode(token))
+        return sort_field, last_value, ObjectId(last_id)
+    except (InvalidId, ValueError, TypeError, binascii.Error) as e:
+        raise ValueError("Not a valid page token") from e
+
+
+class GetCatalogueModel(BaseModel):
+    category: StrictStr | None = None
+    min_price: conint(ge=0) | None = None
+    max_price: conint(ge=0) | None = None
+    in_stock: bool = False
+    sort: Literal["price", "-price", "name", "-name"] | None = None
+    fields: list[StrictStr] | None = None
+    limit: conint(gt=0) | None = None
+    stream: bool = False
+    after: tuple | None = None
+
+    @validator("fields", pre=True)
+    def check_fields(cls, value):
+        """
+        Split the comma separated fields and check they are product fields.
+        """
+        if value in (None, ""):
+            return None
+        fields = sorted(set(value.split(",")))
+        if unknown := set(fields) - set(PRODUCT_FIELDS):
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return fields
+
+    @validator("after", pre=True)
+    def check_after(cls, value, values):
+        """
+        Decode the opaque page token and check it was issued for the
+        requested sort order.
+        """
+        if value in (None, ""):
+            return None
+        token = decode_page_token(value)
+        sort_field, _ = parse_sort(values.get("sort"))
+        if token[0] != sort_field:
+            raise ValueError("The page token doesn't match the sort order")
+        return token
+
+    class Config:
+        extra = Extra.forbid
@@ -0,0 +1,39 @@
+-- add a product to the client's cart in a single atomic statement:
+-- create the cart if the client has none, otherwise increase the quantity of
+-- the product if it's already in the cart or append it to the items
+
+INSERT INTO cart AS c (
+    client_id,
+    items
+)
+VALUES (
+    %(client_id)s,
+    jsonb_build_array(
+        jsonb_build_object('id', %(id)s::text, 'quantity', %(quantity)s::int)
+    )
+)
+ON CONFLICT (client_id) DO UPDATE
+SET items = CASE
+    WHEN c.items @> jsonb_build_array(jsonb_build_object('id', %(id)s::text))
+    THEN (
+        SELECT jsonb_agg(
+            CASE
+                WHEN item ->> 'id' = %(id)s::text
+                THEN jsonb_set(
+                    item,
+                    '{quantity}',
+                    to_jsonb((item ->> 'quantity')::int + %(quantity)s::int)
+                )
+                ELSE item
+            END
+            ORDER BY position
+        )
+        FROM jsonb_array_elements(c.items) WITH ORDINALITY AS t(item, position)
+    )
+    ELSE COALESCE(c.items, '[]'::jsonb) || EXCLUDED.items
+END
+RETURNING (
+    SELECT (item ->> 'quantity')::int
+    FROM jsonb_array_elements(c.items) AS item
+    WHERE item ->> 'id' = %(id)s::text
+) AS quantity
@@ -1,9 +0,0 @@
-INSERT INTO cart(
-    client_id,
-    items
-)
-VALUES (
-    %(client_id)s,
-    %(items)s
-)
-RETURNING *
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- replace the items of the client's cart with the ones buffered in redis,
+-- creating the cart if the client has none
+
+INSERT INTO cart (
+    client_id,
+    items
+)
+VALUES (
+    %(client_id)s,
+    %(items)s
+)
+ON CONFLICT (client_id) DO UPDATE
+SET items = EXCLUDED.items
@@ -1,8 +1,9 @@
 from .. import dashboard_blueprint as bp
 
 from flask import abort, request, current_app
-from src.utils.extras import validate_data, mongo_connection
-from pydantic import BaseModel, Extra, StrictStr, StrictInt, HttpUrl
+from pymongo.errors import DuplicateKeyError
+from src.utils.extras import validate_data, invalidate_catalogue
+from src.utils.models import AddProductModel
 
 
 @bp.route("/add", methods=["PUT"])
@@ -25,8 +26,8 @@ def add_product():
             "message": "Product added successfully"
         }
     """
-    # connection to MongoDB
-    mongo_client = mongo_connection()
+    # shared MongoDB client
+    mongo_client = current_app.config["mongo_client"]
     collection = mongo_client.store.products
 
     print("imame konekcija do mongodb")
@@ -36,23 +37,14 @@ def add_product():
 
     validated_data = validate_data(body, AddProductModel)
 
-    # check if product already exists
-    if collection.find_one({"name": validated_data["name"]}):
+    # insert product to the database,
+    # the unique index on name rejects already existing products
+    try:
+        collection.insert_one(validated_data)
+    except DuplicateKeyError:
         abort(409, "Product already exists")
 
-    # insert product to the database
-    collection.insert_one(validated_data)
+    # invalidate the cached catalogue
+    invalidate_catalogue()
 
     return {"status": "success", "message": "Product added successfully"}
-
-
-class AddProductModel(BaseModel):
-    category: StrictStr
-    name: StrictStr
-    price: StrictInt
-    quantity: StrictInt
-    description: StrictStr
-    image_url: HttpUrl
-
-    class Config:
-        extra = Extra.forbid
@@ -0,0 +1,155 @@
+from .. import dashboard_blueprint as bp
+
+import io
+import json
+from flask import abort, request, current_app
+from pydantic import BaseModel, Extra, StrictStr, ValidationError, conlist
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+from src.utils.extras import validate_data, invalidate_catalogue
+from src.utils.models import AddProductModel
+
+
+@bp.route("/bulk", methods=["PUT"])
+def bulk_add_products():
+    """
+    Endpoint to import products to the catalogue in bulk
+    :method: PUT
+    :input: NDJSON body, one product per line, same fields as /dashboard/add
+        {"category": "...", "name": "...", "price": ..., "quantity": ..., ...}
+        {"category": "...", "name": "...", "price": ..., "quantity": ..., ...}
+    :query: upsert=true to replace products with the same name
+    instead of reporting them as already existing
+    :return: JSON response
+        {
+            "status": "success",
+            "inserted": "number of inserted products",
+            "updated": "number of replaced products",
+            "errors": [
+                {
+                    "line": "line number in the body",
+                    "detail": "why the product was not written"
+                }
+            ]
+        }
+    """
+
+    upsert = request.args.get("upsert", "").lower() in ("1", "true")
+    chunk_size = current_app.config["BULK_CHUNK_SIZE"]
+
+    # shared MongoDB client
+    mongo_client = current_app.config["mongo_client"]
+    collection = mongo_client.store.products
+
+    report = {"inserted": 0, "updated": 0, "errors": []}
+    chunk = []
+
+    # read the body line by line so it's never loaded whole into memory,
+    # buffered since the raw stream of the dev server reads a byte at a time
+    lines = io.BufferedReader(request.stream)
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            product = AddProductModel(**json.loads(line)).dict()
+        except ValidationError as e:
+            report["errors"].append(
+                {"line": line_number, "detail": json.loads(e.json())}
+            )
+            continue
+        except (ValueError, TypeError):
+            report["errors"].append(
+                {"line": line_number, "detail": "Not a JSON object"}
+            )
+            continue
+
+        chunk.append((line_number, product))
+        if len(chunk) >= chunk_size:
+            write_chunk(collection, chunk, upsert, report)
+            chunk = []
+
+    if chunk:
+        write_chunk(collection, chunk, upsert, report)
+
+    report["errors"].sort(key=lambda error: error["line"])
+
+    if report["inserted"] or report["updated"]:
+        # invalidate the cached catalogue
+        invalidate_catalogue()
+
+    return {"status": "success", **report}
+
+
+@bp.route("/bulk", methods=["DELETE"])
+def bulk_remove_products():
+    """
+    Endpoint to remove products from the catalogue in bulk
+    :method: DELETE
+    :input: JSON payload
+        {
+            "names": ["product name", "product name"]
+        }
+    :return: JSON response
+        {
+            "status": "success",
+            "deleted": "number of removed products"
+        }
+    """
+
+    # check for JSON body
+    if not (body := request.get_json(silent=True)):
+        abort(400, "Missing JSON Body in the Request")
+
+    names = validate_data(body, BulkRemoveProductsModel)["names"]
+    chunk_size = current_app.config["BULK_CHUNK_SIZE"]
+
+    # shared MongoDB client
+    mongo_client = current_app.config["mongo_client"]
+    collection = mongo_client.store.products
+
+    deleted = 0
+    for i in range(0, len(names), chunk_size):
+        chunk = names[i : i + chunk_size]
+        deleted += collection.delete_many({"name": {"$in": chunk}}).deleted_count
+
+    if deleted:
+        # invalidate the cached catalogue
+        invalidate_catalogue()
+
+    return {"status": "success", "deleted": deleted}
+
+
+def write_chunk(collection, chunk: list[tuple[int, dict]], upsert: bool, report: dict):
+    """
+    Write a chunk of products with one unordered bulk write, so a failing
+    product doesn't stop the rest, and add the outcome to the report.
+    """
+
+    if upsert:
+        requests = [
+            ReplaceOne({"name": product["name"]}, product, upsert=True)
+            for _, product in chunk
+        ]
+    else:
+        requests = [InsertOne(product) for _, product in chunk]
+
+    try:
+        result = collection.bulk_write(requests, ordered=False).bulk_api_result
+    except BulkWriteError as e:
+        result = e.details
+        for error in result["writeErrors"]:
+            line_number = chunk[error["index"]][0]
+            detail = (
+                "Product already exists" if error["code"] == 11000 else error["errmsg"]
+            )
+            report["errors"].append({"line": line_number, "detail": detail})
+
+    report["inserted"] += result["nInserted"] + result["nUpserted"]
+    report["updated"] += result["nMatched"]
+
+
+class BulkRemoveProductsModel(BaseModel):
+    names: conlist(StrictStr, min_items=1)
+
+    class Config:
+        extra = Extra.forbid
@@ -0,0 +1,29 @@
+from .. import dashboard_blueprint as bp
+
+from flask import current_app
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from src.utils.metrics import collect_registry
+
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Endpoint to scrape the metrics, the db_query, db_pipeline and db_pool_wait ones
+    are summed over all the workers, the gauges are the serving worker's
+    :method: GET
+    :input: None
+    :return: Prometheus text format
+        db_query_duration_seconds{query="sql file name"}: query latency histogram
+        db_query_rows_total{query="sql file name"}: rows returned or affected
+        db_query_errors_total{query="sql file name"}: failed queries
+        db_pipeline_duration_seconds{queries="sql file names"}: pipelined batch latency
+        db_pipeline_errors_total{queries="sql file names"}: failed pipelined batches
+        db_pool_wait_seconds{pool="pool name"}: connection checkout wait histogram
+        db_pool_size, db_pool_available, db_requests_waiting{pool="pool name"}: pool occupancy
+        store_<source>_<stat>: the numbers of /dashboard/stats
+    """
+
+    body = generate_latest(collect_registry()) + generate_latest(
+        current_app.config["metrics_registry"]
+    )
+    return body, 200, {"Content-Type": CONTENT_TYPE_LATEST}
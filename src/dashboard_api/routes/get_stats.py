@@ -0,0 +1,94 @@
+from .. import dashboard_blueprint as bp
+
+from flask import current_app
+
+
+@bp.route("/stats", methods=["GET"])
+def get_stats():
+    """
+    Endpoint to get the cache and connection pool statistics
+    :method: GET
+    :input: None
+    :return: JSON response
+        {
+            "db_pool": {
+                "size": "open postgres connections",
+                "available": "idle postgres connections",
+                "waiting": "requests waiting for a connection",
+                "min_size": "connections always kept open",
+                "max_size": "current max number of connections",
+                "hard_max": "max_size never grows over this",
+                "grows": "times max_size was raised",
+                "shrinks": "times max_size was lowered",
+                "last_avg_wait_ms": "average wait for a connection in the last interval"
+            },
+            "db_replicas": {
+                "replicas": {
+                    "replica name": {
+                        "healthy": "whether read-only queries are sent to it",
+                        "lag": "seconds behind the primary at the last check",
+                        "reads": "connections given to read-only queries"
+                    }
+                },
+                "primary_fallbacks": "read-only queries sent to the primary"
+            },
+            "catalogue_cache": {
+                "hits": "number of catalogue requests served from cache",
+                "misses": "number of catalogue requests served from MongoDB"
+            },
+            "query_cache": {
+                "hits": "query results served from redis",
+                "misses": "query results loaded from postgres"
+            },
+            "cart_buffer": {
+                "dirty": "carts changed in redis and not written to postgres yet",
+                "flushing": "carts being written to postgres",
+                "flushed": "carts written to postgres by this process",
+                "batches": "flushes done by this process",
+                "errors": "flushes that failed",
+                "last_flush_ms": "duration of the last flush"
+            },
+            "product_cache": {
+                "hits": "product lookups served from this process' memory",
+                "misses": "product lookups that went to MongoDB",
+                "hit_rate": "hits / (hits + misses)",
+                "size": "number of cached products"
+            },
+            "token_cache": {
+                "hits": "token revocation checks served from this process' memory",
+                "misses": "token revocation checks that went to redis",
+                "hit_rate": "hits / (hits + misses)",
+                "size": "number of cached tokens"
+            },
+            "user_cache": {
+                "hits": "user lookups served from this process' memory",
+                "misses": "user lookups that went to redis or postgres",
+                "hit_rate": "hits / (hits + misses)",
+                "size": "number of cached users"
+            },
+            "password_hasher": {
+                "rounds": "bcrypt cost factor",
+                "pending": "hashes waiting for a free worker",
+                "completed": "hashes and checks done",
+                "rejected": "calls rejected because the queue was full",
+                "avg_queue_ms": "average time waited for a worker",
+                "max_queue_ms": "longest time waited for a worker",
+                "avg_run_ms": "average time of a hash or check"
+            }
+        }
+    """
+
+    replica_router = current_app.config["replica_router"]
+    cart_buffer = current_app.config["cart_buffer"]
+
+    return {
+        "db_pool": current_app.config["db_pool_autoscaler"].stats(),
+        "db_replicas": replica_router.stats() if replica_router else None,
+        "catalogue_cache": current_app.config["catalogue_cache"].stats(),
+        "query_cache": current_app.config["query_cache"].stats(),
+        "cart_buffer": cart_buffer.stats() if cart_buffer else None,
+        "product_cache": current_app.config["product_cache"].stats(),
+        "token_cache": current_app.config["token_store"].stats(),
+        "user_cache": current_app.config["user_cache"].stats(),
+        "password_hasher": current_app.config["password_hasher"].stats(),
+    }
@@ -1,7 +1,7 @@
 from .. import dashboard_blueprint as bp
 
 from flask import abort, request, current_app
-from src.utils.extras import validate_data, mongo_connection
+from src.utils.extras import validate_data, invalidate_catalogue
 from pydantic import BaseModel, Extra, StrictStr, StrictInt, HttpUrl
 
 
@@ -21,8 +21,8 @@ def remove_product():
         }
     """
 
-    # connection to MongoDB
-    mongo_client = mongo_connection()
+    # shared MongoDB client
+    mongo_client = current_app.config["mongo_client"]
     collection = mongo_client.store.products
 
     # check for JSON body
@@ -31,12 +31,13 @@ def remove_product():
 
     validated_data = validate_data(body, RemoveProductModel)
 
-    # check if product exists
-    if not collection.find_one({"name": validated_data["name"]}):
+    # remove product from the database
+    result = collection.delete_one({"name": validated_data["name"]})
+    if not result.deleted_count:
         abort(404, "Product not found")
 
-    # remove product from the database
-    collection.delete_one({"name": validated_data["name"]})
+    # invalidate the cached catalogue
+    invalidate_catalogue()
 
     return {"status": "success", "message": "Product removed successfully"}
 
@@ -1,166 +1,29 @@
-import time
-import traceback
-from functools import wraps
-from typing import Any, Callable, Tuple
+from typing import Any, Callable, Iterable, Sequence
 
-import psycopg2
-import psycopg2.pool
-import psycopg2.extras
-from psycopg2.extras import RealDictCursor, execute_values
+from psycopg import sql
+from psycopg_pool import ConnectionPool
 
-from flask import current_app
-
-
-def db_pool_conn_exchange(fn: Callable) -> Callable:
-    """Wrapper function that handles pool connections and database connection retries.
-    If a connection from the pool is available, it's occupied and used by the query function, then returned to the pool.
-    If it's not available, and there is room to create more, it creates a new connection, uses it, and destroys it in the end.
-    If it can't create a new connection, it has a waiting mechanism to get a new connection as soon as one opens up.
-    Handles retries logic if the connection is closed.
-
-    Args:
-        fn (function): A query funciton
-
-    Raises:
-        Exception: psycopg2.InterfaceError - Connection is closed, need to retry
-        Exception: default exception - raise error
-
-    Returns:
-        callable: Returns the query function
-    """
-
-    @wraps(fn)
-    def wrapper(*args, **kw):
-        cls = args[0]
-        db_conn, db_cur = None, None
-        for i in range(cls._RECONNECT_TRIES):
-            try:
-                db_conn, db_cur = cls.db_pool.get_conn_cur()
-                cls.db_connection = db_conn
-                cls.db_cur = db_cur
-                return fn(*args, **kw)
-            except psycopg2.InterfaceError as interface_err:
-                print("Idle for %s seconds" % (cls._RECONNECT_IDLE))
-                time.sleep(cls._RECONNECT_IDLE)
-                connection_key = cls.db_pool.postgreSQL_pool._rused[id(db_conn)]
-                print(connection_key, "cK")
-                db_conn = cls.db_pool.postgreSQL_pool._connect(
-                    connection_key
-                )  # just used to reconnect the connection
-                print("Reconnected {}!".format(connection_key))
-            finally:
-                if db_conn:
-                    return_retries = 0
-                    while return_retries < 3:
-                        try:
-                            return_retries += 1
-                            cls.db_cur.close()
-                            cls.db_pool.postgreSQL_pool.putconn(db_conn)
-                            break
-                        except psycopg2.OperationalError as e:
-                            print(
-                                "Failed to return to pool, return counter is {}".format(
-                                    return_retries
-                                )
-                            )
-                            if return_retries >= 3:
-                                raise Exception(
-                                    "Unable to return the used connection to the database connection pool!"
-                                )
-                            continue
-                        except Exception as e:
-                            print(
-                                traceback.format_exc(),
-                                "Unable to return the used connection to the database connection pool!",
-                            )
-                            if return_retries >= 3:
-                                raise Exception(
-                                    "Unable to return the used connection to the database connection pool!"
-                                )
-                        time.sleep(cls._RECONNECT_IDLE)
-
-    return wrapper
+from src.utils.extras import db_connection
 
 
 class DatabasePool(object):
-    """Class for creating a pool of database connections."""
-
-    def __init__(self, annotation_db=False, min_conn=1, max_conn=3):
-        """Creates and initializes a connection pool for the database
+    """
+    Query helpers on top of the app's shared psycopg3 connection pool
+    (app.config["db_pool"]), so there is a single pool of connections
+    toward the database no matter which query API a route uses.
+    """
 
+    def __init__(self, db_pool: ConnectionPool):
+        """
         Args:
-            annotation_db (bool, optional): Are the connections toward the annotation database. Defaults to False.
-            min_conn (int, optional): Min number of connections in the pool. Defaults to 1.
-            max_conn (int, optional): Max number of connections in the pool. Defaults to 3.
+            db_pool (ConnectionPool): The app's shared psycopg3 connection pool
         """
-        self.annotation_db_conn = annotation_db
-        # print(self.annotation_db_conn)
-        self.max_conn = max_conn
-        self.min_conn = min_conn
-        self.hostname = current_app.config["DB_HOST"]
-        self.username = current_app.config["DB_USER"]
-        self.password = current_app.config["DB_PASSWORD"]
-        self.database = current_app.config["DB_NAME"]
-
-        self.GET_POOL_CONN_TIMEOUT = 30
-
-        # print(self.username, self.password, self.hostname, self.database)
-        self.postgreSQL_pool = psycopg2.pool.ThreadedConnectionPool(
-            self.min_conn,
-            self.max_conn,
-            user=self.username,
-            password=self.password,
-            host=self.hostname,
-            port="5432",
-            database=self.database,
-        )
+        self.db_pool = db_pool
 
-    def get_conn_cur(self) -> Tuple:
-        """Fetch a single connection and a cursor from it from the pool
-
-        Returns:
-            tuple: db_connection, db_cursor
-        """
-        db_connection = None
-        db_cur = None
-        start_time = time.time()
-
-        while time.time() - start_time < self.GET_POOL_CONN_TIMEOUT:
-            a = time.time()
-            try:
-                db_connection = self.postgreSQL_pool.getconn()
-            except psycopg2.pool.PoolError as pool_err:
-                time.sleep(0.03)
-            if db_connection:
-                db_cur = db_connection.cursor(cursor_factory=RealDictCursor)
-                break
-        return db_connection, db_cur
-
-    def db_pool_conn_exchange(func):
-        """Decorator function to handle connection and cursor exchange with the database pool"""
-
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            db_pool = DatabasePool()
-            db_connection, db_cur = db_pool.get_conn_cur()
-            kwargs["db_connection"] = db_connection
-            kwargs["db_cur"] = db_cur
-            try:
-                result = func(*args, **kwargs)
-            except Exception as e:
-                db_connection.rollback()
-                raise e
-            finally:
-                db_pool.postgreSQL_pool.putconn(db_connection)
-            return result
-
-        return wrapper
-
-    @db_pool_conn_exchange
     def execute_query(
         self,
         query: str,
-        data: dict[str, Any] | tuple[Any] | None = None,
+        data: dict[str, Any] | tuple[Any] | list | None = None,
         conn_autocommit: bool = True,
         fetch_all: bool = False,
         execute_many: bool = False,
@@ -169,48 +32,95 @@ class DatabasePool(object):
 
         Args:
             query (str): sql query string
-            data (dict[str, Any] | tuple[Any] | None, optional): The arguments passed to the query. Defaults to None.
-            conn_autocommit (bool, optional): Whether to automatically commit the transaction after the query is done executing. Defaults to True.
+            data (dict[str, Any] | tuple[Any] | list | None, optional): The arguments passed to the query.
+            With execute_many a list of arguments, the query is executed once for each of them. Defaults to None.
+            conn_autocommit (bool, optional): Whether to run every statement in its own transaction.
+            If False all the statements run in one transaction, committed when the query is done executing. Defaults to True.
             fetch_all (bool, optional):
             Whether to return an array of all items fetched from the database, or a dictionary with the first one found. Defaults to False.
             execute_many(bool, optional): Whether to execute for many rows at once. Defaults to False.
         Raises:
-            Exception: handles query rollback and resets the autocommit property on exception.
+            Exception: the transaction is rolled back and the exception re-raised.
 
         Returns:
             dict | list: The result of the query from the database.
         """
         try:
-            # set connection to (auto)commit
-            self.db_connection.autocommit = conn_autocommit
-
-            if execute_many:
-                # execute query for multiple values
-                result = execute_values(self.db_cur, query, data, fetch=True)
-            else:
-                # execute single query
-                self.db_cur.execute(query, data) if data else self.db_cur.execute(query)
-                # fetch the data
-                result = self.db_cur.fetchall() if fetch_all else self.db_cur.fetchone()
-
-            # manually commit if user designated so
-            if conn_autocommit == False:
-                self.db_connection.commit()
-            self.db_connection.autocommit = False
-
-            # When trying to fetch many results psycopg2 will return empty list
+            with db_connection(self.db_pool, autocommit=conn_autocommit) as conn:
+                with conn.cursor() as cursor:
+                    if execute_many:
+                        # execute query for multiple values, pipelined by psycopg,
+                        # and collect the rows returned by every execution
+                        cursor.executemany(query, data, returning=True)
+                        result = []
+                        while True:
+                            if cursor.description:
+                                result.extend(cursor.fetchall())
+                            if not cursor.nextset():
+                                break
+                    else:
+                        # execute single query
+                        cursor.execute(query, data)
+                        # fetch the data, if the query returns any
+                        if cursor.description is None:
+                            result = [] if fetch_all else None
+                        else:
+                            result = (
+                                cursor.fetchall() if fetch_all else cursor.fetchone()
+                            )
+
+            # When trying to fetch many results psycopg will return empty list
             # if there are no results, however if we're fetching just one result
-            # psycopg2 will return None if no result found, but since a Flask route
+            # psycopg will return None if no result found, but since a Flask route
             # can't return None we defalt this value to empty dict in that case.
             return {} if result is None else result
 
         except Exception as e:
             print(e.args, "Failed to execute a DB query in suiteapi")
-            if conn_autocommit == False:
-                self.db_connection.rollback()
-            self.db_connection.autocommit = False
-
             raise e
 
-    def __del__(self):
-        pass  # implement deletion method for connection pool
+    def copy_rows(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+        chunk_size: int = 10000,
+        on_progress: Callable[[int], None] | None = None,
+    ) -> int:
+        """Bulk load rows into a table with COPY FROM STDIN, in one transaction.
+
+        Rows are consumed one at a time and streamed to the server through
+        psycopg's bounded copy buffer, so a generator of millions of rows is
+        loaded with constant memory.
+
+        Args:
+            table (str): Name of the table to load the rows into.
+            columns (Sequence[str]): The table columns, in the order of the values in each row.
+            rows (Iterable[Sequence[Any]]): Any iterable or generator of rows.
+            Wrap JSON values in psycopg.types.json.Jsonb.
+            chunk_size (int, optional): Call on_progress every chunk_size rows. Defaults to 10000.
+            on_progress (Callable[[int], None] | None, optional):
+            Called with the number of rows copied so far. Defaults to None.
+        Raises:
+            Exception: if any row fails, nothing is loaded.
+
+        Returns:
+            int: The number of rows loaded.
+        """
+        query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+        )
+
+        count = 0
+        with db_connection(self.db_pool, autocommit=False) as conn:
+            with conn.cursor() as cursor:
+                with cursor.copy(query) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                        count += 1
+                        if on_progress and count % chunk_size == 0:
+                            on_progress(count)
+
+        if on_progress and count % chunk_size:
+            on_progress(count)
+        return count
@@ -0,0 +1,30 @@
+from pymongo import ASCENDING, IndexModel
+from pymongo.collection import Collection
+
+
+# Indexes of the products collection.
+# Index names are fixed, so creating them again on every startup is a no-op.
+# The compound indexes serve the catalogue filters together with its sort
+# orders (including the _id tie-breaker of the keyset pagination).
+PRODUCT_INDEXES = [
+    IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+    IndexModel(
+        [("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)],
+        name="category_price",
+    ),
+    IndexModel([("category", ASCENDING), ("name", ASCENDING)], name="category_name"),
+    IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+]
+
+
+def create_product_indexes(collection: Collection) -> list[str]:
+    """Create the products collection indexes if they don't exist yet.
+
+    Args:
+        collection (Collection): The products collection
+
+    Returns:
+        list[str]: Names of the indexes
+    """
+    return collection.create_indexes(PRODUCT_INDEXES)
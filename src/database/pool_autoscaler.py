@@ -0,0 +1,114 @@
+import logging
+import threading
+
+from psycopg_pool import ConnectionPool
+
+
+class PoolAutoscaler(object):
+    """
+    Resizes the shared psycopg3 pool from its own usage statistics.
+
+    The pool opens connections on demand up to its max_size, and closes the
+    ones that stayed idle for max_idle seconds down to its min_size. Every
+    interval seconds the autoscaler looks at how long requests waited for a
+    connection and how many are still waiting, and raises max_size by step
+    when either passes its threshold. When nobody waited, max_size follows
+    the pool back down as max_idle closes the idle connections, never below
+    the max_size the pool was created with (DB_POOL_MAX_CONN), so the pool
+    still opens connections on demand up to it between two checks.
+    max_size always stays between that base size and hard_max.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        hard_max: int,
+        interval: float = 1,
+        grow_wait_ms: float = 50,
+        grow_queue: int = 1,
+        step: int = 2,
+        logger: logging.Logger | None = None,
+    ):
+        self.pool = pool
+        self.base_max = pool.max_size
+        self.hard_max = max(hard_max, self.base_max)
+        self.interval = interval
+        self.grow_wait_ms = grow_wait_ms
+        self.grow_queue = grow_queue
+        self.step = step
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._grows = 0
+        self._shrinks = 0
+        self._last_wait_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="db-pool-autoscaler", daemon=True
+        )
+
+    def start(self) -> "PoolAutoscaler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        # reset the counters, only the requests since startup matter
+        self.pool.pop_stats()
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                self.logger.exception("Failed to resize the DB pool")
+
+    def check(self) -> None:
+        """Look at the pool usage since the last check and resize it if needed."""
+        stats = self.pool.pop_stats()
+        queued = stats.get("requests_queued", 0)
+        waiting = stats.get("requests_waiting", 0)
+        avg_wait_ms = stats.get("requests_wait_ms", 0) / queued if queued else 0.0
+        size = stats.get("pool_size", 0)
+        max_size = self.pool.max_size
+
+        with self._lock:
+            self._last_wait_ms = avg_wait_ms
+
+        if avg_wait_ms >= self.grow_wait_ms or waiting >= self.grow_queue:
+            new_max = min(max_size + self.step, self.hard_max)
+            reason = f"avg wait {avg_wait_ms:.0f}ms, {waiting} waiting"
+        elif not queued:
+            new_max = max(size, self.base_max)
+            reason = "no requests waited"
+        else:
+            return
+
+        if new_max == max_size:
+            return
+
+        self.pool.resize(self.pool.min_size, new_max)
+        with self._lock:
+            if new_max > max_size:
+                self._grows += 1
+            else:
+                self._shrinks += 1
+
+        log = self.logger.warning if new_max > max_size else self.logger.info
+        log("DB pool max_size %s -> %s (%s)", max_size, new_max, reason)
+
+    def stats(self) -> dict[str, int | float]:
+        pool_stats = self.pool.get_stats()
+        with self._lock:
+            return {
+                "size": pool_stats.get("pool_size", 0),
+                "available": pool_stats.get("pool_available", 0),
+                "waiting": pool_stats.get("requests_waiting", 0),
+                "min_size": self.pool.min_size,
+                "max_size": self.pool.max_size,
+                "base_max": self.base_max,
+                "hard_max": self.hard_max,
+                "grows": self._grows,
+                "shrinks": self._shrinks,
+                "last_avg_wait_ms": round(self._last_wait_ms, 2),
+            }
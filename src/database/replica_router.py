@@ -0,0 +1,139 @@
+import logging
+import threading
+from itertools import count
+
+from psycopg import Connection
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
+
+# Seconds the replica is behind the primary, 0 when it streams WAL from the
+# primary and has replayed all it received, or when the server isn't a replica
+# at all. A replica whose WAL receiver isn't streaming stops receiving WAL, so
+# it's as far behind as its last replayed transaction however much it replayed.
+REPLICATION_LAG_QUERY = """
+SELECT COALESCE(
+    CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN (SELECT status FROM pg_stat_wal_receiver) IS DISTINCT FROM 'streaming'
+            THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END,
+    'Infinity'
+)::float AS lag
+"""
+
+
+class ReplicaRouter(object):
+    """
+    Hands out connections to read replicas in round robin, skipping the
+    unhealthy ones.
+
+    A background thread checks every replica each check_interval seconds, a
+    replica is healthy when it answers, streams WAL from the primary and its
+    replication lag is at most max_lag seconds. A replica that doesn't give a connection within
+    checkout_timeout seconds is skipped until its next successful check.
+    When no replica is available the caller falls back to the primary.
+    """
+
+    def __init__(
+        self,
+        pools: list[ConnectionPool],
+        max_lag: float = 5,
+        check_interval: float = 5,
+        checkout_timeout: float = 1,
+        logger: logging.Logger | None = None,
+    ):
+        self.pools = pools
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.checkout_timeout = checkout_timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._next = count()
+        # None until the first check
+        self._healthy = {pool.name: None for pool in pools}
+        self._lag = {pool.name: None for pool in pools}
+        self._reads = {pool.name: 0 for pool in pools}
+        self._fallbacks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="db-replica-checker", daemon=True
+        )
+
+    def start(self) -> "ReplicaRouter":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def getconn(self) -> tuple[ConnectionPool | None, Connection | None]:
+        """
+        Return a connection of the next healthy replica and the pool to give
+        it back to, or (None, None) if no replica is available.
+        """
+        start = next(self._next)
+        for i in range(len(self.pools)):
+            pool = self.pools[(start + i) % len(self.pools)]
+            if not self._healthy[pool.name]:
+                continue
+            try:
+                conn = pool.getconn(timeout=self.checkout_timeout)
+            except PoolTimeout:
+                self._set_health(pool, False, "no connection available")
+                continue
+            except TooManyRequests:
+                continue
+            with self._lock:
+                self._reads[pool.name] += 1
+            return pool, conn
+
+        with self._lock:
+            self._fallbacks += 1
+        return None, None
+
+    def _run(self) -> None:
+        while True:
+            for pool in self.pools:
+                self.check(pool)
+            if self._stop.wait(self.check_interval):
+                return
+
+    def check(self, pool: ConnectionPool) -> None:
+        try:
+            with pool.connection(timeout=self.checkout_timeout) as conn:
+                lag = conn.execute(REPLICATION_LAG_QUERY).fetchone()["lag"]
+        except Exception as e:
+            self._set_health(pool, False, f"check failed: {e}")
+            return
+
+        with self._lock:
+            self._lag[pool.name] = lag
+        if lag > self.max_lag:
+            self._set_health(pool, False, f"lag {lag:.1f}s")
+        else:
+            self._set_health(pool, True, f"lag {lag:.1f}s")
+
+    def _set_health(self, pool: ConnectionPool, healthy: bool, reason: str) -> None:
+        with self._lock:
+            changed = self._healthy[pool.name] != healthy
+            self._healthy[pool.name] = healthy
+        if changed:
+            log = self.logger.info if healthy else self.logger.warning
+            state = "up" if healthy else "down"
+            log("DB replica %s is %s (%s)", pool.name, state, reason)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replicas": {
+                    pool.name: {
+                        "healthy": bool(self._healthy[pool.name]),
+                        "lag": self._lag[pool.name],
+                        "reads": self._reads[pool.name],
+                    }
+                    for pool in self.pools
+                },
+                "primary_fallbacks": self._fallbacks,
+            }
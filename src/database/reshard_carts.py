@@ -0,0 +1,157 @@
+"""
+Move the carts to their shard after changing the cart shards.
+
+    python -m src.database.reshard_carts --to "db-1/carts,db-2/carts,db-3/carts"
+
+Reads every cart of the current shards (--from, CART_SHARDS by default, or the
+main database when there are none) and moves the ones that belong to another
+shard under the new list of shards (--to). Create the cart table of new shards
+with sql/shards/cart.schema.sql first. Stop the cart writes while it runs,
+then set CART_SHARDS to the new list and restart the app.
+
+With CART_WRITE_BEHIND the carts buffered in redis must be written to the
+shards first: stop the app once /dashboard/stats shows no dirty or flushing
+carts in cart_buffer. The tool refuses to run while there are any left.
+
+With the jump consistent hash, appending a shard to n shards only moves
+1 / (n + 1) of the carts, all of them to the new shard. A failed run can be
+run again, a cart is only deleted from its old shard once it's written to
+its new one.
+"""
+
+import argparse
+
+import redis
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.types.json import Jsonb
+
+from config import Config
+from .shard_router import jump_hash, parse_shard
+
+UPSERT_CART = """
+INSERT INTO cart (client_id, items)
+VALUES (%(client_id)s, %(items)s)
+ON CONFLICT (client_id) DO UPDATE SET items = EXCLUDED.items
+"""
+
+DELETE_CARTS = "DELETE FROM cart WHERE client_id = ANY(%(client_ids)s)"
+
+
+def reshard_carts(
+    from_shards: list[str],
+    to_shards: list[str],
+    config: type,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> dict[str, int]:
+    """
+    Move the carts of from_shards to their shard in to_shards,
+    return how many carts were moved to each shard.
+    """
+
+    def connect(shard: str, **kwargs) -> psycopg.Connection:
+        host, port, dbname = parse_shard(shard, config.DB_NAME)
+        conninfo = make_conninfo(
+            user=config.DB_USER,
+            password=config.DB_PASSWORD,
+            host=host,
+            port=port,
+            dbname=dbname,
+        )
+        return psycopg.connect(conninfo, **kwargs)
+
+    # the same database may be in both lists, compare them by connection info
+    def key(shard: str) -> tuple:
+        return parse_shard(shard, config.DB_NAME)
+
+    targets = [connect(shard) for shard in to_shards]
+    moved = {shard: 0 for shard in to_shards}
+
+    try:
+        for source_shard in from_shards:
+            with connect(source_shard) as reader, connect(source_shard) as writer:
+                # server side cursor, the carts are read in batches
+                cursor = reader.cursor(name="reshard_carts")
+                cursor.itersize = batch_size
+                cursor.execute("SELECT client_id, items FROM cart ORDER BY client_id")
+
+                while rows := cursor.fetchmany(batch_size):
+                    by_target: dict[int, list] = {}
+                    for client_id, items in rows:
+                        shard = jump_hash(client_id, len(to_shards))
+                        if key(to_shards[shard]) != key(source_shard):
+                            by_target.setdefault(shard, []).append((client_id, items))
+
+                    for shard, carts in by_target.items():
+                        moved[to_shards[shard]] += len(carts)
+                        if dry_run:
+                            continue
+                        # write to the new shard first, then delete from the old one
+                        with targets[shard].transaction():
+                            targets[shard].cursor().executemany(
+                                UPSERT_CART,
+                                [
+                                    {"client_id": client_id, "items": Jsonb(items)}
+                                    for client_id, items in carts
+                                ],
+                            )
+                        with writer.transaction():
+                            writer.execute(
+                                DELETE_CARTS,
+                                {"client_ids": [client_id for client_id, _ in carts]},
+                            )
+
+                print(f"{source_shard}: done")
+    finally:
+        for conn in targets:
+            conn.close()
+
+    return moved
+
+
+def buffered_carts(config: type) -> int:
+    """Number of carts of the write-behind buffer not written to postgres yet."""
+    client = redis.Redis(
+        host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.CART_BUFFER_DB
+    )
+    pipe = client.pipeline(transaction=False)
+    pipe.zcard("cart:dirty")
+    pipe.zcard("cart:flushing")
+    return sum(pipe.execute())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--from",
+        dest="from_shards",
+        help="comma separated shards the carts are in now, defaults to CART_SHARDS",
+    )
+    parser.add_argument(
+        "--to", required=True, help="comma separated shards the carts go to"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count the moves")
+    args = parser.parse_args()
+
+    if args.from_shards:
+        from_shards = [shard for shard in args.from_shards.split(",") if shard]
+    else:
+        from_shards = Config.CART_SHARDS or [f"{Config.DB_HOST}/{Config.DB_NAME}"]
+    to_shards = [shard for shard in args.to.split(",") if shard]
+
+    if Config.CART_WRITE_BEHIND and (pending := buffered_carts(Config)):
+        parser.error(f"{pending} carts are still buffered in redis, flush them first")
+
+    moved = reshard_carts(
+        from_shards, to_shards, Config, batch_size=args.batch_size, dry_run=args.dry_run
+    )
+    for shard, count in moved.items():
+        print(f"{shard}: {count} carts {'to move' if args.dry_run else 'moved'}")
+
+
+if __name__ == "__main__":
+    main()
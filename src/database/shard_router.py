@@ -0,0 +1,48 @@
+from psycopg_pool import ConnectionPool
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach): map key to one of buckets.
+    Going from n to n + 1 buckets only moves 1 / (n + 1) of the keys,
+    all of them to the new bucket.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def parse_shard(spec: str, default_dbname: str) -> tuple[str, int, str]:
+    """
+    Split a "host[:port][/dbname]" shard spec into host, port and dbname.
+    The host may be a unix socket directory when the dbname is given.
+    """
+    address, _, dbname = spec.strip().rpartition("/")
+    if not address:
+        address, dbname = dbname, ""
+    host, _, port = address.partition(":")
+    return host, int(port or 5432), dbname or default_dbname
+
+
+class ShardRouter(object):
+    """
+    Routes the carts of each client to one of the cart shard databases by a
+    jump consistent hash of the client id. The order of the pools is the
+    shard number, so shards must only be appended, and after changing their
+    number the carts must be moved with src.database.reshard_carts.
+    """
+
+    def __init__(self, pools: list[ConnectionPool]):
+        if not pools:
+            raise ValueError("At least one cart shard is needed")
+        self.pools = pools
+
+    def shard_of(self, client_id: int) -> int:
+        return jump_hash(client_id, len(self.pools))
+
+    def pool_for(self, client_id: int) -> ConnectionPool:
+        return self.pools[self.shard_of(client_id)]
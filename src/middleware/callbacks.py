@@ -5,8 +5,6 @@ from src import jwt
 # from src import limiter
 from .utils.process_error import failed_response
 
-# from .utils.client import fetch_user_by_public_id_from_cache
-
 
 # @limiter.request_filter
 # def options_exclude():
@@ -14,24 +12,26 @@ from .utils.process_error import failed_response
 #     return request.method.upper() == "OPTIONS"
 
 
-# @jwt.user_lookup_loader
-# def user_lookup_callback(jwt_header: dict, jwt_payload: dict) -> dict:
-#     """
-#     A callback function that loads a user from the database (or cache) whenever
-#     a protected route is accessed. This should return a dict containing the client info
-#     on a successful lookup, or None if the lookup failed for any reason
-#     (for example if the user cannot be found in the database).
-#     This makes the client accessible at flask_jwt_extended.current_user
-#     """
-#     cache_conn = current_app.config["redis_users_cache_conn"]
-#     return fetch_user_by_public_id_from_cache(jwt_payload["sub"], cache_conn)
+@jwt.user_lookup_loader
+def user_lookup_callback(jwt_header: dict, jwt_payload: dict) -> dict | None:
+    """
+    A callback function that loads a user from the database (or cache) whenever
+    a protected route is accessed. This should return a dict containing the client info
+    on a successful lookup, or None if the lookup failed for any reason
+    (for example if the user cannot be found in the database).
+    This makes the client accessible at flask_jwt_extended.current_user
+    """
+    return current_app.config["user_cache"].get(jwt_payload["sub"])
+
+
+@jwt.user_lookup_error_loader
+def my_user_lookup_error_callback(jwt_header: dict, jwt_payload: dict) -> Response:
+    return failed_response(401, "User Not Found, Can't Complete Authorization")
 
 
 @jwt.token_in_blocklist_loader
 def check_if_token_is_revoked(jwt_header: dict, jwt_payload: dict) -> bool:
-    jti = jwt_payload["jti"]
-    entry = current_app.config["redis_login_connection"].get(jti)
-    return True if entry is None else entry == "true"
+    return current_app.config["token_store"].is_revoked(jwt_payload["jti"])
 
 
 @jwt.invalid_token_loader
@@ -0,0 +1,312 @@
+import time
+import logging
+import threading
+from typing import Any, Iterable
+
+import redis
+from psycopg.types.json import Jsonb
+
+from .extras import db_connection, run_pipeline
+
+# Add quantities to the products of a cart and mark the cart dirty, or return
+# nil if the cart isn't in redis yet and has to be loaded first.
+ADD_ITEMS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local quantities = {}
+for i = 3, #ARGV, 2 do
+    quantities[#quantities + 1] = redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+-- keep the cart until it's written to postgres
+redis.call('PERSIST', KEYS[1])
+redis.call('ZADD', KEYS[2], 'NX', ARGV[2], ARGV[1])
+quantities[#quantities + 1] = redis.call('ZCARD', KEYS[2])
+return quantities
+"""
+
+# Load a cart read from postgres, unless another request already did.
+# The "_" field marks the cart as loaded, so an empty cart exists too.
+SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], '_', '1', unpack(ARGV, 2))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+# Give back to the dirty set the carts claimed by a flusher that died,
+# then claim the oldest dirty carts.
+CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[2]))
+for _, client_id in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], client_id)
+    redis.call('ZADD', KEYS[1], 'NX', now, client_id)
+end
+local claimed = redis.call('ZPOPMIN', KEYS[1], ARGV[3])
+local client_ids = {}
+for i = 1, #claimed, 2 do
+    redis.call('ZADD', KEYS[2], now, claimed[i])
+    client_ids[#client_ids + 1] = claimed[i]
+end
+return client_ids
+"""
+
+# Return the carts still claimed by the flush that claimed them at ARGV[1],
+# the others were given to another flusher after claim_timeout.
+OWNED_SCRIPT = """
+local owned = {}
+for i = 2, #ARGV do
+    if tonumber(redis.call('ZSCORE', KEYS[1], ARGV[i])) == tonumber(ARGV[1]) then
+        owned[#owned + 1] = ARGV[i]
+    end
+end
+return owned
+"""
+
+# Release the flushed carts still claimed by the flush that claimed them at
+# ARGV[3], the ones that weren't changed since are only kept in redis for
+# another ttl seconds.
+DONE_SCRIPT = """
+for i = 4, #ARGV do
+    if tonumber(redis.call('ZSCORE', KEYS[2], ARGV[i])) == tonumber(ARGV[3]) then
+        redis.call('ZREM', KEYS[2], ARGV[i])
+        if not redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+            redis.call('EXPIRE', ARGV[2] .. ':' .. ARGV[i], ARGV[1])
+        end
+    end
+end
+"""
+
+
+class CartBuffer(object):
+    """
+    Write-behind buffer of the carts: cart writes only change a redis hash
+    per client (product id -> quantity), loaded from postgres on its first
+    write, and mark the client's cart dirty.
+
+    A background thread writes the dirty carts to their postgres shard in
+    batches of batch_size, every flush_interval seconds or as soon as there
+    are batch_size dirty carts. A flusher claims the carts it writes in a
+    sorted set, and claims older than claim_timeout seconds go back to the
+    dirty set, so the carts of a process that dies mid flush are written by
+    another one. A flusher only writes and releases the carts it still
+    claims, so a stalled flusher doesn't overwrite the newer state written
+    by the one that took its carts over; it can still do so if it stalls
+    for claim_timeout seconds between that check and its commit, so
+    claim_timeout must be well above the time a flush takes. A cart changed
+    during its flush is written again by the next one. Written carts stay
+    in redis for ttl seconds after their last write. The carts are only as
+    durable as the redis persistence.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        cart_shards: Any,
+        query_registry: Any,
+        query_cache: Any = None,
+        flush_interval: float = 1,
+        batch_size: int = 500,
+        claim_timeout: float = 60,
+        ttl: int = 86400,
+        prefix: str = "cart",
+        logger: logging.Logger | None = None,
+    ):
+        self.client = client
+        self.cart_shards = cart_shards
+        self.query_registry = query_registry
+        self.query_cache = query_cache
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        self.ttl = ttl
+        self.prefix = prefix
+        self.dirty_key = f"{prefix}:dirty"
+        self.flushing_key = f"{prefix}:flushing"
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._add_items = self.client.register_script(ADD_ITEMS_SCRIPT)
+        self._seed = self.client.register_script(SEED_SCRIPT)
+        self._claim = self.client.register_script(CLAIM_SCRIPT)
+        self._owned = self.client.register_script(OWNED_SCRIPT)
+        self._done = self.client.register_script(DONE_SCRIPT)
+
+        self._lock = threading.Lock()
+        self._flushed = 0
+        self._batches = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="cart-flusher", daemon=True
+        )
+
+    def start(self) -> "CartBuffer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def add(self, client_id: int, items: Iterable[dict]) -> list[int]:
+        """
+        Add the quantities of items ({"id": ..., "quantity": ...}) to the
+        client's cart and return the new quantity of each item.
+        """
+        args = [client_id, time.time()]
+        for item in items:
+            args += [item["id"], item["quantity"]]
+
+        keys = [f"{self.prefix}:{client_id}", self.dirty_key]
+        if (result := self._add_items(keys=keys, args=args)) is None:
+            self._load(client_id)
+            result = self._add_items(keys=keys, args=args)
+
+        *quantities, dirty = result
+        if dirty >= self.batch_size:
+            self._wake.set()
+        return quantities
+
+    def get(self, client_id: int) -> list[dict] | None:
+        """The items of the client's cart, or None if it isn't in redis."""
+        cart = self.client.hgetall(f"{self.prefix}:{client_id}")
+        if not cart:
+            return None
+        return [
+            {"id": product_id, "quantity": int(quantity)}
+            for product_id, quantity in cart.items()
+            if product_id != "_"
+        ]
+
+    def _load(self, client_id: int) -> None:
+        pool = self.cart_shards.pool_for(client_id)
+        with db_connection(pool) as conn:
+            with self.query_registry.execute(
+                conn, "get_cart", {"client_id": client_id}
+            ) as cursor:
+                result = cursor.fetchone()
+
+        args = [self.ttl]
+        for item in result["items"] if result and result["items"] else []:
+            args += [item["id"], item["quantity"]]
+        self._seed(keys=[f"{self.prefix}:{client_id}"], args=args)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                # keep going while there are full batches
+                while self.flush() >= self.batch_size:
+                    pass
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+                self.logger.exception("Failed to flush the carts to the DB")
+
+    def flush(self) -> int:
+        """Write a batch of dirty carts to postgres, return how many were claimed."""
+        started_at = time.perf_counter()
+        claimed_at = time.time()
+        client_ids = self._claim(
+            keys=[self.dirty_key, self.flushing_key],
+            args=[claimed_at, self.claim_timeout, self.batch_size],
+        )
+        if not client_ids:
+            return 0
+
+        pipe = self.client.pipeline(transaction=False)
+        for client_id in client_ids:
+            pipe.hgetall(f"{self.prefix}:{client_id}")
+        carts = pipe.execute()
+
+        # one pipelined transaction per shard
+        by_shard: dict[int, list] = {}
+        for client_id, cart in zip(map(int, client_ids), carts):
+            items = [
+                {"id": product_id, "quantity": int(quantity)}
+                for product_id, quantity in cart.items()
+                if product_id != "_"
+            ]
+            shard = self.cart_shards.shard_of(client_id)
+            by_shard.setdefault(shard, []).append((client_id, items))
+
+        flushed = []
+        for shard, shard_carts in by_shard.items():
+            # skip the carts taken over by another flusher while this one
+            # was stalled, their state in shard_carts may be older than theirs
+            owned = set(
+                map(
+                    int,
+                    self._owned(
+                        keys=[self.flushing_key],
+                        args=[claimed_at, *(i for i, _ in shard_carts)],
+                    ),
+                )
+            )
+            if len(owned) < len(shard_carts):
+                self.logger.warning(
+                    "Skipping %s carts claimed by another flush",
+                    len(shard_carts) - len(owned),
+                )
+            shard_carts = [cart for cart in shard_carts if cart[0] in owned]
+            if not shard_carts:
+                continue
+
+            statements = [
+                ("set_cart_items", {"client_id": client_id, "items": Jsonb(items)})
+                for client_id, items in shard_carts
+            ]
+            ids = [client_id for client_id, _ in shard_carts]
+            try:
+                run_pipeline(
+                    self.cart_shards.pools[shard], self.query_registry, statements
+                )
+            except Exception as e:
+                # give the carts back to be written by the next flush
+                pipe = self.client.pipeline()
+                pipe.zrem(self.flushing_key, *ids)
+                pipe.zadd(self.dirty_key, {i: time.time() for i in ids}, nx=True)
+                pipe.execute()
+                with self._lock:
+                    self._errors += 1
+                self.logger.warning("Failed to flush %s carts: %s", len(ids), e)
+                continue
+            flushed += ids
+
+        if flushed:
+            self._done(
+                keys=[self.dirty_key, self.flushing_key],
+                args=[self.ttl, self.prefix, claimed_at, *flushed],
+            )
+            # the carts are already written, a cache outage only leaves
+            # the old cached carts until they expire
+            if self.query_cache:
+                try:
+                    self.query_cache.invalidate(*(f"cart:{i}" for i in flushed))
+                except redis.RedisError as e:
+                    self.logger.warning("Failed to invalidate the cached carts: %s", e)
+
+        with self._lock:
+            self._flushed += len(flushed)
+            self._batches += 1
+            self._last_flush_ms = (time.perf_counter() - started_at) * 1000
+        return len(client_ids)
+
+    def stats(self) -> dict[str, int | float]:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(self.dirty_key)
+        pipe.zcard(self.flushing_key)
+        dirty, flushing = pipe.execute()
+        with self._lock:
+            return {
+                "dirty": dirty,
+                "flushing": flushing,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "errors": self._errors,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+            }
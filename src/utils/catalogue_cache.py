@@ -0,0 +1,76 @@
+import redis
+from typing import Any, Callable
+
+from .local_cache import listen_for_invalidations
+
+# Read the current catalogue version, the entry cached under it and count
+# the hit or miss, all in one round trip.
+GET_ENTRY_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+local entry = redis.call('GET', KEYS[2] .. ':v' .. version .. ':' .. ARGV[1])
+redis.call('HINCRBY', KEYS[3], entry and 'hits' or 'misses', 1)
+return {version, entry}
+"""
+
+
+class CatalogueCache(object):
+    """
+    Class to create a redis connection to the catalogue cache.
+    Entries are stored under the current catalogue version, so bumping the
+    version on every catalogue write makes all the old entries unreachable.
+    The TTL only cleans up entries of old versions.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        cache_db: int = 0,
+        ttl: int = 86400,
+        prefix: str = "catalogue",
+    ):
+        self.client = redis.Redis(host=host, port=port, db=cache_db)
+        self.ttl = ttl
+        self.version_key = f"{prefix}:version"
+        self.entry_prefix = f"{prefix}:entry"
+        self.stats_key = f"{prefix}:stats"
+        self.channel = f"{prefix}:invalidate"
+        self._get_entry = self.client.register_script(GET_ENTRY_SCRIPT)
+
+    def get(self, variant: str) -> tuple[str, bytes | None]:
+        """
+        Return the current catalogue version and the entry cached for the
+        given variant (page, filters...) or None if there isn't one.
+        """
+        keys = [self.version_key, self.entry_prefix, self.stats_key]
+        version, entry = self._get_entry(keys=keys, args=[variant])
+        return version.decode("utf-8"), entry
+
+    def set(self, version: str, variant: str, entry: str | bytes) -> None:
+        key = f"{self.entry_prefix}:v{version}:{variant}"
+        self.client.set(key, entry, ex=self.ttl)
+
+    def bump_version(self) -> int:
+        """
+        Invalidate all the cached entries and notify the subscribed local
+        caches. Call after every catalogue write.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(self.version_key)
+        pipe.publish(self.channel, "")
+        version, _ = pipe.execute()
+        return version
+
+    def subscribe(self, handler: Callable[[Any], None]) -> None:
+        """Call handler in a background thread on every catalogue write."""
+        listen_for_invalidations(self.client, self.channel, handler)
+
+    def stats(self) -> dict[str, int | None]:
+        try:
+            stats = self.client.hgetall(self.stats_key)
+        except redis.RedisError:
+            return {"hits": None, "misses": None}
+        return {
+            "hits": int(stats.get(b"hits", 0)),
+            "misses": int(stats.get(b"misses", 0)),
+        }
@@ -1,14 +1,18 @@
 import json
+import time
 import functools
+import redis
 from pathlib import Path
-from typing import Generator
+from typing import Any, Generator, Iterable
 from contextlib import contextmanager
-from pymongo import MongoClient
+from bson import ObjectId
 
-from psycopg_pool import ConnectionPool
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
 from pydantic import BaseModel, ValidationError
 
-from flask import abort
+from flask import abort, current_app
+
+from .metrics import QUERY_NAMES, observe_pipeline, observe_pool_wait
 
 
 def validate_data(
@@ -28,29 +32,117 @@ def validate_data(
         abort(422, json.loads(e.json()))
 
 
-def mongo_connection():
+def to_object_id(value: str) -> ObjectId | None:
     """
-    Function to make a connection to the MongoDB database
-    :return: MongoClient object
+    Return the MongoDB ObjectId for a product id string as stored in the cart,
+    or None if the string is not a valid ObjectId.
     """
-    try:
-        client = MongoClient("mongodb://store-mongodb:27017/")
-        return client
-    except Exception as e:
-        abort(500, str(e))
+    return ObjectId(value) if ObjectId.is_valid(value) else None
 
 
 @functools.cache
 def read_query(path: str | Path) -> str:
-    return Path(path).read_text()
+    query = Path(path).read_text()
+    # queries are reported in the metrics by the name of their file
+    QUERY_NAMES[query] = Path(path).stem
+    return query
 
 
 @contextmanager
-def db_connection(db_pool: ConnectionPool, autocommit: bool = True) -> Generator:
+def db_connection(
+    db_pool: ConnectionPool, autocommit: bool = True, read_only: bool = False
+) -> Generator:
     """
     Just a thin context wrapper arround psycopg3 to avoid constantly setting
     `conn.autocommit = autocommit` which will be True in the majority of the use cases.
+
+    When all the connections are in use the request waits in the pool's FIFO queue
+    and gets the first connection returned to the pool. If none is returned within
+    DB_POOL_TIMEOUT seconds, or the queue already has DB_POOL_MAX_WAITING requests,
+    the request fails with 503.
+
+    With read_only=True the connection comes from a healthy read replica of the
+    app's replica router (app.config["replica_router"]) if there is one, otherwise
+    from db_pool. Only use it for queries that can read data a few seconds old.
     """
-    with db_pool.connection() as conn:
+    started_at = time.perf_counter()
+    pool, conn = None, None
+    if read_only and (replica_router := current_app.config.get("replica_router")):
+        pool, conn = replica_router.getconn()
+
+    if conn is None:
+        pool = db_pool
+        try:
+            conn = db_pool.getconn()
+        except (PoolTimeout, TooManyRequests):
+            abort(503, "Database busy, please try again later")
+    observe_pool_wait(pool, started_at)
+
+    # same as ConnectionPool.connection: commit or rollback on exit
+    # and give the connection back to its pool
+    try:
         conn.autocommit = autocommit
-        yield conn
+        with conn:
+            yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def read_only_passes() -> tuple[bool, ...]:
+    """
+    The read_only values to try in turn for a row that may have just been
+    written: a replica first, then the primary if the row isn't there yet.
+    Only the primary when there are no replicas.
+    """
+    if current_app.config.get("replica_router"):
+        return (True, False)
+    return (False,)
+
+
+def invalidate_catalogue() -> None:
+    """
+    Bump the version of the app's catalogue cache after a catalogue write.
+    The write is already done, so a redis outage is only logged and the old
+    entries are served until they expire.
+    """
+    try:
+        current_app.config["catalogue_cache"].bump_version()
+    except redis.RedisError as e:
+        current_app.logger.warning("Failed to invalidate the catalogue cache: %s", e)
+
+
+def invalidate_cart(client_id: int) -> None:
+    """
+    Drop the client's cached cart from the app's query cache after a cart
+    write. The write is already done, so a redis outage is only logged and
+    the old cart is served until it expires.
+    """
+    try:
+        current_app.config["query_cache"].invalidate(f"cart:{client_id}")
+    except redis.RedisError as e:
+        current_app.logger.warning("Failed to invalidate the cached cart: %s", e)
+
+
+def run_pipeline(
+    db_pool: ConnectionPool,
+    query_registry: Any,
+    statements: Iterable[tuple[str, dict[str, Any] | tuple[Any] | None]],
+) -> list[list[dict]]:
+    """
+    Run independent statements of the QueryRegistry, given as (name, params),
+    in one transaction in psycopg3 pipeline mode: all the statements are sent
+    without waiting for the previous results, so the whole batch costs about
+    one round trip. Return the rows of every statement, in the same order.
+    If any statement fails none of them is committed.
+    """
+    statements = list(statements)
+    with db_connection(db_pool, autocommit=False) as conn:
+        # the results only arrive when the pipeline syncs,
+        # so the statements are timed together
+        with observe_pipeline(conn, [name for name, _ in statements]) as cursors:
+            with conn.pipeline():
+                cursors += [
+                    query_registry.execute(conn, name, params)
+                    for name, params in statements
+                ]
+        return [cursor.fetchall() if cursor.description else [] for cursor in cursors]
@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import redis
+from redis.client import PubSubWorkerThread
+
+# returned by LocalCache.get when there is no entry, so None can be cached
+MISSING = object()
+
+
+class LocalCache(object):
+    """
+    Thread-safe LRU cache with a TTL on every entry, kept in the process memory.
+    Once max_size entries are cached the least recently used one is evicted.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or MISSING if it's not cached or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "size": len(self._entries),
+            }
+
+
+def listen_for_invalidations(
+    client: redis.Redis, channel: str, handler: Callable[[Any], None]
+) -> PubSubWorkerThread:
+    """
+    Call handler with the data of every message published on the channel,
+    from a daemon thread. Keeps local caches coherent across processes.
+
+    Messages published while the connection is down are lost, so on any
+    connection error the handler is called with None, which means that
+    anything may have changed and the whole local cache should be dropped.
+    """
+
+    def on_message(message: dict) -> None:
+        handler(message["data"])
+
+    def on_error(error: Exception, pubsub, thread: PubSubWorkerThread) -> None:
+        handler(None)
+        time.sleep(1)
+
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{channel: on_message})
+    return pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=on_error)
@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Generator, Iterable
+
+import redis
+from psycopg import Connection, Cursor
+from psycopg_pool import ConnectionPool
+from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Query and pool wait metrics, served in the Prometheus text format by /dashboard/metrics.
+# Under gunicorn every worker has its own, so PROMETHEUS_MULTIPROC_DIR must point to an
+# empty directory shared by the workers before the app starts: each worker then writes
+# its values there and a scrape sums those of all the workers (see collect_registry).
+REGISTRY = CollectorRegistry()
+
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute a postgres query",
+    ["query"],
+    registry=REGISTRY,
+)
+QUERY_ROWS = Counter(
+    "db_query_rows",
+    "Rows returned or affected by postgres queries",
+    ["query"],
+    registry=REGISTRY,
+)
+QUERY_ERRORS = Counter(
+    "db_query_errors",
+    "Postgres queries that raised an error",
+    ["query"],
+    registry=REGISTRY,
+)
+PIPELINE_DURATION = Histogram(
+    "db_pipeline_duration_seconds",
+    "Time to run a batch of postgres queries in pipeline mode",
+    ["queries"],
+    registry=REGISTRY,
+)
+PIPELINE_ERRORS = Counter(
+    "db_pipeline_errors",
+    "Batches of postgres queries in pipeline mode that raised an error",
+    ["queries"],
+    registry=REGISTRY,
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time waited to get a connection from a postgres pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    registry=REGISTRY,
+)
+
+# query text -> name of the .sql file it was read from, see read_query
+QUERY_NAMES: dict[str, str] = {}
+
+
+def collect_registry() -> CollectorRegistry:
+    """
+    The registry to scrape the query metrics from: all the workers' when
+    PROMETHEUS_MULTIPROC_DIR is set, otherwise only this process's.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def query_name(query: Any) -> str:
+    """Name of the .sql file of a query, or "inline" for queries written in the code."""
+    return QUERY_NAMES.get(query, "inline") if isinstance(query, str) else "inline"
+
+
+def observe_pool_wait(pool: ConnectionPool, started_at: float) -> None:
+    """Record the wait for a connection requested at started_at (time.perf_counter)."""
+    POOL_WAIT.labels(pool.name).observe(time.perf_counter() - started_at)
+
+
+def instrumented_cursor(
+    slow_query_ms: float, logger: logging.Logger | None = None
+) -> type[Cursor]:
+    """
+    Return a psycopg3 cursor class, to be used as the connections' cursor_factory,
+    that records the duration, rows and errors of every query by its .sql file name,
+    and logs the queries slower than slow_query_ms. Queries run in pipeline mode
+    only get their results when the pipeline syncs, they are recorded together
+    by observe_pipeline instead.
+    """
+    logger = logger or logging.getLogger(__name__)
+
+    class InstrumentedCursor(Cursor):
+        def execute(self, query, params=None, **kwargs):
+            with self._observe(query):
+                return super().execute(query, params, **kwargs)
+
+        def executemany(self, query, params_seq, **kwargs):
+            with self._observe(query):
+                return super().executemany(query, params_seq, **kwargs)
+
+        @contextmanager
+        def _observe(self, query) -> Generator:
+            if self.connection.pgconn.pipeline_status:
+                yield
+                return
+
+            name = query_name(query)
+            started_at = time.perf_counter()
+            try:
+                yield
+            except Exception:
+                QUERY_ERRORS.labels(name).inc()
+                raise
+            finally:
+                duration = time.perf_counter() - started_at
+                QUERY_DURATION.labels(name).observe(duration)
+                if duration * 1000 >= slow_query_ms:
+                    logger.warning("Slow query %s: %.0fms", name, duration * 1000)
+            if self.rowcount > 0:
+                QUERY_ROWS.labels(name).inc(self.rowcount)
+
+    # for observe_pipeline
+    InstrumentedCursor.slow_query_ms = slow_query_ms
+    InstrumentedCursor.logger = logger
+    return InstrumentedCursor
+
+
+@contextmanager
+def observe_pipeline(conn: Connection, names: list[str]) -> Generator:
+    """
+    Record a batch of queries run by the block in pipeline mode: the duration
+    and errors of the whole batch, by its query names, and the rows of the
+    cursors the block appends to the yielded list, one per name. A batch
+    slower than the connection's instrumented_cursor slow_query_ms is logged.
+    """
+    label = ",".join(sorted(set(names)))
+    cursors = []
+    started_at = time.perf_counter()
+    try:
+        yield cursors
+    except Exception:
+        PIPELINE_ERRORS.labels(label).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - started_at
+        PIPELINE_DURATION.labels(label).observe(duration)
+        slow_query_ms = getattr(conn.cursor_factory, "slow_query_ms", None)
+        if slow_query_ms is not None and duration * 1000 >= slow_query_ms:
+            conn.cursor_factory.logger.warning(
+                "Slow pipeline %s of %s queries: %.0fms",
+                label,
+                len(names),
+                duration * 1000,
+            )
+    for name, cursor in zip(names, cursors):
+        if cursor.rowcount > 0:
+            QUERY_ROWS.labels(name).inc(cursor.rowcount)
+
+
+class StatsCollector(object):
+    """
+    Exports as gauges the usage of the postgres connection pools and the
+    stats() of the app's caches, read at every scrape. They are the numbers
+    of the worker serving the scrape. A source whose stats() fails, e.g. a
+    redis backed cache while redis is down, is skipped.
+    """
+
+    # measures of psycopg_pool's get_stats, its counters are reset by the autoscaler
+    POOL_MEASURES = (
+        "pool_min",
+        "pool_max",
+        "pool_size",
+        "pool_available",
+        "requests_waiting",
+    )
+
+    def __init__(
+        self,
+        db_pools: Iterable[ConnectionPool],
+        stats: dict[str, Callable[[], dict]],
+        logger: logging.Logger | None = None,
+    ):
+        self.db_pools = db_pools
+        self.stats = stats
+        self.logger = logger or logging.getLogger(__name__)
+
+    def collect(self) -> Generator:
+        for measure in self.POOL_MEASURES:
+            gauge = GaugeMetricFamily(
+                f"db_{measure}", f"psycopg_pool {measure}", labels=["pool"]
+            )
+            for pool in self.db_pools:
+                gauge.add_metric([pool.name], pool.get_stats().get(measure, 0))
+            yield gauge
+
+        for source, get_stats in self.stats.items():
+            try:
+                stats = get_stats()
+            except redis.RedisError as e:
+                self.logger.warning("Skipping the %s metrics: %s", source, e)
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(
+                        f"store_{source}_{key}", f"{source} {key}", value=value
+                    )
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Extra, StrictStr, StrictInt, HttpUrl
+
+
+class AddProductModel(BaseModel):
+    """Fields of a catalogue product, shared by the dashboard and catalogue APIs."""
+
+    category: StrictStr
+    name: StrictStr
+    price: StrictInt
+    quantity: StrictInt
+    description: StrictStr
+    image_url: HttpUrl
+
+    class Config:
+        extra = Extra.forbid
@@ -0,0 +1,96 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import bcrypt
+from flask import abort
+
+
+class PasswordHasher(object):
+    """
+    Hashes and checks passwords with bcrypt on a bounded pool of worker threads
+    (bcrypt releases the GIL while hashing), so a burst of logins occupies at
+    most max_workers CPUs instead of every request thread.
+    At most max_pending calls wait for a free worker, the ones over that limit
+    wait up to queue_timeout seconds for a place in the queue and then fail
+    with 503 instead of piling up.
+    """
+
+    def __init__(
+        self,
+        rounds: int = 12,
+        max_workers: int = 2,
+        max_pending: int = 16,
+        queue_timeout: float = 5,
+    ):
+        self.rounds = rounds
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="bcrypt")
+        self.slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._run_time_total = 0.0
+
+    def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode("utf-8"), salt).decode("utf-8")
+
+    def check(self, password_hash: str, password: str) -> bool:
+        """Return False for a wrong password or a hash that isn't a bcrypt one."""
+        try:
+            return self._run(
+                bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8")
+            )
+        except ValueError:
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether the hash was made with a different cost than the current one."""
+        # bcrypt hash format: $2b$<cost>$<salt and hash>
+        return int(password_hash.split("$")[2]) != self.rounds
+
+    def _run(self, fn: Callable, *args) -> Any:
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            abort(503, "Server busy, please try again later")
+
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._pending += 1
+
+        def task():
+            started_at = time.monotonic()
+            with self._lock:
+                self._pending -= 1
+                queue_time = started_at - submitted_at
+                self._queue_time_total += queue_time
+                self._queue_time_max = max(self._queue_time_max, queue_time)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._completed += 1
+                    self._run_time_total += time.monotonic() - started_at
+                self.slots.release()
+
+        return self.executor.submit(task).result()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "rounds": self.rounds,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_queue_ms": round(self._queue_time_total / completed * 1000, 2),
+                "max_queue_ms": round(self._queue_time_max * 1000, 2),
+                "avg_run_ms": round(self._run_time_total / completed * 1000, 2),
+            }
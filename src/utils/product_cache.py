@@ -0,0 +1,61 @@
+from typing import Iterable
+
+from bson import ObjectId
+from pymongo.collection import Collection
+
+from .extras import to_object_id
+from .local_cache import LocalCache, MISSING
+
+
+class ProductCache(object):
+    """
+    In-process cache of the product details needed by the cart, keyed by
+    product id. Products that don't exist are cached too (as None), so
+    repeated lookups of unknown ids don't reach MongoDB either.
+    Cleared on every catalogue write, see CatalogueCache.subscribe.
+    """
+
+    FIELDS = ("name", "price", "quantity")
+
+    def __init__(self, collection: Collection, max_size: int = 10000, ttl: float = 60):
+        self.collection = collection
+        self.cache = LocalCache(max_size=max_size, ttl=ttl)
+
+    def get(self, product_id: str) -> dict | None:
+        """Return the product details or None if the product doesn't exist."""
+        return self.get_many([product_id])[product_id]
+
+    def get_many(self, product_ids: Iterable[str]) -> dict[str, dict | None]:
+        """
+        Return the details of all the given products, fetching the ones
+        that aren't cached with a single query.
+        """
+        products = {}
+        # ids differing only in hex case are the same ObjectId
+        missing: dict[ObjectId, list[str]] = {}
+        for product_id in product_ids:
+            if (product := self.cache.get(product_id)) is not MISSING:
+                products[product_id] = product
+            elif oid := to_object_id(product_id):
+                missing.setdefault(oid, []).append(product_id)
+            else:
+                products[product_id] = None
+
+        if missing:
+            query = {"_id": {"$in": list(missing)}}
+            projection = dict.fromkeys(self.FIELDS, 1)
+            found = {
+                doc.pop("_id"): doc for doc in self.collection.find(query, projection)
+            }
+            for oid, ids in missing.items():
+                for product_id in ids:
+                    products[product_id] = found.get(oid)
+                    self.cache.set(product_id, products[product_id])
+
+        return products
+
+    def clear(self, *args) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
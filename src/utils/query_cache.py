@@ -0,0 +1,155 @@
+import json
+import time
+import hashlib
+import functools
+from contextlib import suppress
+from typing import Any, Callable, Iterable
+
+import redis
+from flask import current_app
+
+# Build the key of an entry from the current versions of its tags, read the
+# entry and count the hit or miss, all in one round trip.
+GET_ENTRY_SCRIPT = """
+local key = ARGV[1]
+for i = 1, #KEYS - 1 do
+    key = key .. ':' .. (redis.call('GET', KEYS[i]) or '0')
+end
+local entry = redis.call('GET', key)
+redis.call('HINCRBY', KEYS[#KEYS], entry and 'hits' or 'misses', 1)
+return {key, entry}
+"""
+
+
+class QueryCache(object):
+    """
+    Redis cache of query results, keyed by query name and parameters.
+
+    Every entry is stored under the current versions of its tags
+    (e.g. "cart:42"), so invalidating a tag bumps its version and makes all
+    the entries tagged with it unreachable, including the ones written by a
+    request that read the database before the invalidation. The TTL only
+    cleans up unreachable entries.
+
+    On a miss only one request loads the result, holding a lock on the key;
+    the others wait up to lock_timeout seconds for it to be cached instead of
+    all going to the database.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        cache_db: int = 0,
+        ttl: int = 60,
+        lock_timeout: float = 5,
+        poll_interval: float = 0.05,
+        prefix: str = "query",
+    ):
+        self.client = redis.Redis(host=host, port=port, db=cache_db)
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.stats_key = f"{prefix}:stats"
+        self._get_entry = self.client.register_script(GET_ENTRY_SCRIPT)
+
+    def get_or_load(
+        self,
+        name: str,
+        params: Any,
+        load: Callable[[], Any],
+        tags: Iterable[str] = (),
+        ttl: int | None = None,
+    ) -> Any:
+        """
+        Return the cached result of the query or call load and cache what it
+        returns. The result must be JSON serializable. If redis is down the
+        query is always loaded.
+        """
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        keys = [f"{self.prefix}:tag:{tag}" for tag in tags] + [self.stats_key]
+
+        try:
+            key, entry = self._get_entry(
+                keys=keys, args=[f"{self.prefix}:{name}:{digest}"]
+            )
+            if entry is not None:
+                return json.loads(entry)
+
+            lock = self.client.lock(f"{key.decode('utf-8')}:lock", self.lock_timeout)
+            if not lock.acquire(blocking=False):
+                # another request is loading it, wait for its result
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(self.poll_interval)
+                    if (entry := self.client.get(key)) is not None:
+                        return json.loads(entry)
+                    if not lock.locked():
+                        break
+                # the loading request failed or took too long
+                return load()
+        except redis.RedisError:
+            return load()
+
+        try:
+            result = load()
+            with suppress(redis.RedisError):
+                self.client.set(
+                    key, json.dumps(result, default=str), ex=ttl or self.ttl
+                )
+        finally:
+            with suppress(redis.RedisError):
+                lock.release()
+        return result
+
+    def invalidate(self, *tags: str) -> None:
+        """Make all the entries tagged with any of tags unreachable."""
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(f"{self.prefix}:tag:{tag}")
+        pipe.execute()
+
+    def stats(self) -> dict[str, int | None]:
+        try:
+            stats = self.client.hgetall(self.stats_key)
+        except redis.RedisError:
+            return {"hits": None, "misses": None}
+        return {
+            "hits": int(stats.get(b"hits", 0)),
+            "misses": int(stats.get(b"misses", 0)),
+        }
+
+
+def cached_query(
+    name: str,
+    tags: Callable[..., Iterable[str]] | None = None,
+    ttl: int | None = None,
+) -> Callable:
+    """
+    Decorator to cache the result of a function running a query in the app's
+    QueryCache (app.config["query_cache"]). The function's arguments are the
+    query parameters, tags gets the same arguments and returns the tags of
+    the result. e.g.
+
+        @cached_query("get_cart", tags=lambda client_id: [f"cart:{client_id}"])
+        def get_cart_items(client_id: int) -> list:
+            ...
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return current_app.config["query_cache"].get_or_load(
+                name,
+                [args, kwargs],
+                lambda: fn(*args, **kwargs),
+                tags=tags(*args, **kwargs) if tags else (),
+                ttl=ttl,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,45 @@
+from pathlib import Path
+from typing import Any, Iterable
+
+from psycopg import Connection, Cursor
+
+from .extras import read_query
+
+
+class QueryRegistry(object):
+    """
+    All the .sql files of the given directories, read once at startup and
+    named by their file name without the extension. The names passed in
+    required must exist, so a missing file stops the app from starting
+    instead of failing the first request that needs it.
+
+    Queries run through execute are prepared on the server the first time a
+    pooled connection runs them, so every following call on that connection
+    skips the parsing and planning.
+    """
+
+    def __init__(self, *directories: Path, required: Iterable[str] = ()):
+        self.queries: dict[str, str] = {}
+        for directory in directories:
+            for path in sorted(Path(directory).glob("*.sql")):
+                if path.stem in self.queries:
+                    raise ValueError(f"Duplicate query name: {path.stem}")
+                self.queries[path.stem] = read_query(path)
+
+        if missing := set(required) - self.queries.keys():
+            raise FileNotFoundError(f"Missing queries: {', '.join(sorted(missing))}")
+
+    def __getitem__(self, name: str) -> str:
+        return self.queries[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.queries
+
+    def execute(
+        self,
+        conn: Connection,
+        name: str,
+        params: dict[str, Any] | tuple[Any] | None = None,
+    ) -> Cursor:
+        """Run a query as a prepared statement on conn and return its cursor."""
+        return conn.execute(self.queries[name], params, prepare=True)
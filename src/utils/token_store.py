@@ -0,0 +1,102 @@
+import time
+import redis
+from datetime import timedelta
+
+from .local_cache import LocalCache, MISSING, listen_for_invalidations
+
+# Revoke all the unexpired tokens of a user and notify the local caches,
+# in one round trip no matter how many sessions the user has.
+REVOKE_ALL_SCRIPT = """
+local jtis = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '+inf')
+redis.call('DEL', KEYS[1])
+for i = 1, #jtis, 1000 do
+    redis.call('DEL', unpack(jtis, i, math.min(i + 999, #jtis)))
+end
+if #jtis > 0 then
+    redis.call('PUBLISH', ARGV[2], table.concat(jtis, ','))
+end
+return #jtis
+"""
+
+
+class TokenStore(object):
+    """
+    Keeps the status of issued tokens in redis, keyed by their jti:
+    "false" while the token is valid, "true" or no key once it's revoked.
+    Every jti expires together with its token, and the jtis of each user are
+    indexed in a sorted set scored by expiry, so all the sessions of a user
+    can be revoked at once.
+
+    Lookups go through a small in-process cache first. Revocations are
+    published on a redis channel and every process drops the revoked jtis
+    from its cache, so a revocation applies everywhere within the pub/sub
+    delay, or within cache_ttl seconds if the message is lost.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        cache_size: int = 10000,
+        cache_ttl: float = 5,
+        channel: str = "tokens:revoked",
+        prefix: str = "user_tokens",
+    ):
+        self.client = client
+        self.channel = channel
+        self.prefix = prefix
+        self._revoke_all = self.client.register_script(REVOKE_ALL_SCRIPT)
+        self.cache = LocalCache(max_size=cache_size, ttl=cache_ttl)
+        listen_for_invalidations(self.client, self.channel, self._on_revoked)
+
+    def is_revoked(self, jti: str) -> bool:
+        if (revoked := self.cache.get(jti)) is MISSING:
+            entry = self.client.get(jti)
+            revoked = True if entry is None else entry == "true"
+            self.cache.set(jti, revoked)
+        return revoked
+
+    def add_session(
+        self,
+        identity: str,
+        access_jti: str,
+        refresh_jti: str,
+        access_expires: timedelta,
+        refresh_expires: timedelta,
+    ) -> None:
+        """
+        Store the jtis of a new access/refresh token pair as valid and index
+        them under the user, in one round trip. Expired jtis are pruned from
+        the user's index on every login.
+        """
+        now = time.time()
+        index = f"{self.prefix}:{identity}"
+        pipe = self.client.pipeline()
+        pipe.set(access_jti, "false", ex=access_expires)
+        pipe.set(refresh_jti, "false", ex=refresh_expires)
+        pipe.zadd(
+            index,
+            {
+                access_jti: now + access_expires.total_seconds(),
+                refresh_jti: now + refresh_expires.total_seconds(),
+            },
+        )
+        pipe.zremrangebyscore(index, "-inf", now)
+        # the refresh token of the latest session is always the last to expire
+        pipe.expire(index, max(access_expires, refresh_expires))
+        pipe.execute()
+
+    def revoke_all(self, identity: str) -> int:
+        """Revoke all the tokens of a user. Returns how many were revoked."""
+        keys = [f"{self.prefix}:{identity}"]
+        return self._revoke_all(keys=keys, args=[time.time(), self.channel])
+
+    def _on_revoked(self, data: str | None) -> None:
+        # None means messages may have been lost, drop everything
+        if data is None:
+            self.cache.clear()
+            return
+        for jti in data.split(","):
+            self.cache.delete(jti)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,78 @@
+import json
+import redis
+from psycopg_pool import ConnectionPool
+
+from .extras import db_connection, read_only_passes
+from .local_cache import LocalCache, MISSING, listen_for_invalidations
+
+
+class UserCache(object):
+    """
+    Two tier read-through cache of client profiles, keyed by the JWT identity
+    (the client's email): an in-process cache in front of redis, in front of
+    postgres. Only found clients are cached.
+
+    Call invalidate whenever a client changes, it drops the redis entry and
+    notifies every process to drop its local entry.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        db_pool: ConnectionPool,
+        query: str,
+        ttl: int = 3600,
+        local_size: int = 10000,
+        local_ttl: float = 30,
+        prefix: str = "user",
+    ):
+        self.client = client
+        self.db_pool = db_pool
+        self.query = query
+        self.ttl = ttl
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        self.cache = LocalCache(max_size=local_size, ttl=local_ttl)
+        listen_for_invalidations(self.client, self.channel, self._on_invalidate)
+
+    def get(self, identity: str) -> dict | None:
+        """Return the client's profile or None if there is no such client."""
+        if (user := self.cache.get(identity)) is not MISSING:
+            return user
+
+        key = f"{self.prefix}:{identity}"
+        if (entry := self.client.get(key)) is not None:
+            user = json.loads(entry)
+        else:
+            # read from a replica, a client created in the last few seconds
+            # may not be there yet so a missing one is looked up on the primary
+            for read_only in read_only_passes():
+                with db_connection(self.db_pool, read_only=read_only) as conn:
+                    with conn.execute(
+                        self.query, {"email": identity}, prepare=True
+                    ) as cursor:
+                        user = cursor.fetchone()
+                if user is not None:
+                    break
+            if user is None:
+                return None
+            self.client.set(key, json.dumps(user), ex=self.ttl)
+
+        self.cache.set(identity, user)
+        return user
+
+    def invalidate(self, identity: str) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(f"{self.prefix}:{identity}")
+        pipe.publish(self.channel, identity)
+        pipe.execute()
+
+    def _on_invalidate(self, identity: str | None) -> None:
+        # None means messages may have been lost, drop everything
+        if identity is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(identity)
+
+    def stats(self) -> dict:
+        return self.cache.stats()